@@ -23,8 +23,8 @@ def upgrade() -> None:
         sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
         sa.Column("name", sa.String(255), nullable=False),
         sa.Column("email", sa.String(255), nullable=False),
-        sa.Column("is_active", sa.Boolean(), nullable=True, server_default="1"),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("is_active", sa.Boolean(), nullable=True, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.PrimaryKeyConstraint("id"),
     )
     op.create_index(op.f("ix_girls_email"), "girls", ["email"], unique=True)
@@ -36,7 +36,7 @@ def upgrade() -> None:
         sa.Column("code", sa.String(16), nullable=False),
         sa.Column("used_at", sa.DateTime(), nullable=True),
         sa.Column("expires_at", sa.DateTime(), nullable=False),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.ForeignKeyConstraint(["girl_id"], ["girls.id"]),
         sa.PrimaryKeyConstraint("id"),
     )
@@ -48,8 +48,8 @@ def upgrade() -> None:
         sa.Column("slug", sa.String(64), nullable=False),
         sa.Column("title", sa.String(255), nullable=False),
         sa.Column("sort_order", sa.Integer(), nullable=True, server_default="0"),
-        sa.Column("is_active", sa.Boolean(), nullable=True, server_default="1"),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("is_active", sa.Boolean(), nullable=True, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.PrimaryKeyConstraint("id"),
     )
     op.create_index(op.f("ix_games_slug"), "games", ["slug"], unique=True)
@@ -59,7 +59,7 @@ def upgrade() -> None:
         sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
         sa.Column("girl_id", sa.Integer(), nullable=False),
         sa.Column("token", sa.String(64), nullable=False),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.ForeignKeyConstraint(["girl_id"], ["girls.id"]),
         sa.PrimaryKeyConstraint("id"),
     )
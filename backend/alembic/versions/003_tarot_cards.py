@@ -25,9 +25,9 @@ def upgrade() -> None:
         sa.Column("title", sa.String(255), nullable=False),
         sa.Column("description", sa.Text(), nullable=False),
         sa.Column("image_url", sa.String(512), nullable=True),
-        sa.Column("is_active", sa.Boolean(), nullable=True, server_default="1"),
+        sa.Column("is_active", sa.Boolean(), nullable=True, server_default=sa.true()),
         sa.Column("sort_order", sa.Integer(), nullable=True, server_default="0"),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.PrimaryKeyConstraint("id"),
     )
     op.create_index(op.f("ix_tarot_cards_uuid"), "tarot_cards", ["uuid"], unique=True)
@@ -39,7 +39,7 @@ def upgrade() -> None:
         sa.Column("past_card_uuid", sa.String(64), nullable=False),
         sa.Column("present_card_uuid", sa.String(64), nullable=False),
         sa.Column("future_card_uuid", sa.String(64), nullable=False),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.PrimaryKeyConstraint("id"),
     )
 
@@ -24,8 +24,8 @@ def upgrade() -> None:
         sa.Column("uuid", sa.String(64), nullable=False),
         sa.Column("text", sa.Text(), nullable=False),
         sa.Column("sort_order", sa.Integer(), nullable=True, server_default="0"),
-        sa.Column("is_active", sa.Boolean(), nullable=True, server_default="1"),
-        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("(CURRENT_TIMESTAMP)")),
+        sa.Column("is_active", sa.Boolean(), nullable=True, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
         sa.PrimaryKeyConstraint("id"),
     )
     op.create_index(op.f("ix_horoscope_predictions_uuid"), "horoscope_predictions", ["uuid"], unique=True)
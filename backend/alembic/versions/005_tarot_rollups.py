@@ -0,0 +1,52 @@
+"""Tarot reading rollups and created_at index
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f("ix_tarot_readings_created_at"), "tarot_readings", ["created_at"], unique=False)
+
+    op.create_table(
+        "tarot_card_counters",
+        sa.Column("card_uuid", sa.String(64), nullable=False),
+        sa.Column("position", sa.String(16), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("card_uuid", "position"),
+    )
+
+    op.create_table(
+        "tarot_hourly_counters",
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("hour"),
+    )
+
+    rollup_state = op.create_table(
+        "tarot_rollup_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("last_reading_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Единственная строка водяного знака: её блокируют FOR UPDATE вставка раскладов и догон
+    op.bulk_insert(rollup_state, [{"id": 1, "last_reading_id": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("tarot_rollup_state")
+    op.drop_table("tarot_hourly_counters")
+    op.drop_table("tarot_card_counters")
+    op.drop_index(op.f("ix_tarot_readings_created_at"), table_name="tarot_readings")
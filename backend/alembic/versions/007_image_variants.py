@@ -0,0 +1,36 @@
+"""Resized image variants for uploads
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "image_variants",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("source_name", sa.String(255), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=False),
+        sa.Column("format", sa.String(16), nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.func.current_timestamp()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_image_variants_source_name"), "image_variants", ["source_name"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_image_variants_source_name"), table_name="image_variants")
+    op.drop_table("image_variants")
@@ -1,42 +1,134 @@
+import asyncio
+import functools
+import hashlib
 import secrets
+import time
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.config import settings
 from app.database import get_db
 from app.models import Girl, AccessCode
+from app.table_versions import GIRLS, table_versions
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
+# sha256(token) -> girl_id: повторные запросы с тем же токеном не проверяют подпись заново
+token_cache: TTLCache[bytes, int] = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+# girl_id -> активная Girl (detached): без запроса к БД на каждый авторизованный запрос
+girl_cache: TTLCache[int, Girl] = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+# sha256(пароль) -> True для X-Admin-Password: bcrypt не на каждый запрос админки
+admin_password_cache: TTLCache[bytes, bool] = TTLCache(16, settings.auth_cache_ttl_seconds)
+# Проверки bcrypt в процессе: параллельные запросы с тем же паролем ждут одну проверку
+_admin_password_checks: dict[bytes, asyncio.Task] = {}
+
+
+# jose и passlib импортируются при первом использовании (health check и скрипты без них),
+# на старте API их заранее подгружает app/warmup.py через preload()
+@functools.cache
+def _pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _jose():
+    from jose import JWTError, jwt
+
+    return jwt, JWTError
+
+
+def preload() -> None:
+    """Import jose/passlib, load the bcrypt backend and run one JWT round trip ahead of the first login."""
+    jwt, _ = _jose()
+    jwt.decode(jwt.encode({"sub": "0"}, settings.secret_key, algorithm="HS256"), settings.secret_key, algorithms=["HS256"])
+    _pwd_context().handler("bcrypt").get_backend()
+
 
 def verify_admin_password(password: str) -> bool:
     if not settings.admin_password_hash:
         return False
-    return pwd_context.verify(password, settings.admin_password_hash)
+    return _pwd_context().verify(password, settings.admin_password_hash)
+
+
+async def check_admin_password(password: str) -> bool:
+    """``verify_admin_password`` in a worker thread, with successful checks cached."""
+    digest = hashlib.sha256(password.encode()).digest()
+    if admin_password_cache.get(digest):
+        return True
+    task = _admin_password_checks.get(digest)
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(verify_admin_password, password))
+        _admin_password_checks[digest] = task
+        task.add_done_callback(lambda _: _admin_password_checks.pop(digest, None))
+    ok = await task
+    if ok:
+        admin_password_cache.set(digest, True)
+    return ok
+
+
+def create_admin_token() -> str:
+    expire = datetime.utcnow() + timedelta(minutes=settings.admin_token_ttl_minutes)
+    payload = {"sub": "admin", "scope": "admin", "exp": expire}
+    jwt, _ = _jose()
+    return jwt.encode(payload, settings.secret_key, algorithm="HS256")
+
+
+def verify_admin_token(token: str) -> bool:
+    jwt, JWTError = _jose()
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+    except JWTError:
+        return False
+    return payload.get("scope") == "admin"
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+
+def generate_access_code() -> str:
+    return secrets.token_hex(4).upper()[:8]
 
 
 def create_access_token(girl_id: int) -> str:
     expire = datetime.utcnow() + timedelta(days=1)
     payload = {"sub": str(girl_id), "exp": expire}
+    jwt, _ = _jose()
     return jwt.encode(payload, settings.secret_key, algorithm="HS256")
 
 
 def decode_access_token(token: str) -> int | None:
+    digest = hashlib.sha256(token.encode()).digest()
+    girl_id = token_cache.get(digest)
+    if girl_id is not None:
+        return girl_id
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-        return int(payload.get("sub"))
+        girl_id = int(payload.get("sub"))
     except (JWTError, ValueError):
         return None
+    # Не дольше, чем живёт сам токен; без exp (подписанный, но бессрочный) — обычный TTL кеша
+    exp = payload.get("exp")
+    token_cache.set(digest, girl_id, ttl=None if exp is None else exp - time.time())
+    return girl_id
+
+
+def evict_girl(girl_id: int | None = None) -> None:
+    """Drop a cached girl after an admin change (all girls if ``girl_id`` is None)."""
+    if girl_id is None:
+        girl_cache.clear()
+    else:
+        girl_cache.pop(girl_id)
+
+
+# Правка девушек в админке любого воркера сбрасывает кеш целиком
+table_versions.subscribe((GIRLS,), evict_girl)
 
 
 async def get_current_girl(
@@ -48,8 +140,15 @@ async def get_current_girl(
     girl_id = decode_access_token(credentials.credentials)
     if not girl_id:
         return None
+    girl = girl_cache.get(girl_id)
+    if girl is not None:
+        return girl
     result = await db.execute(select(Girl).where(Girl.id == girl_id, Girl.is_active))
-    return result.scalar_one_or_none()
+    girl = result.scalar_one_or_none()
+    if girl is not None:
+        db.expunge(girl)
+        girl_cache.set(girl_id, girl)
+    return girl
 
 
 def require_girl(girl: Girl | None = Depends(get_current_girl)) -> Girl:
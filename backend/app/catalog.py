@@ -0,0 +1,82 @@
+"""In-process cache of the public catalog: tarot deck and games.
+
+Колода и список игр меняются только через админку, поэтому публичные эндпоинты
+читают их из памяти. Каталог подписан на версии своих таблиц: после коммита
+админка вызывает ``table_versions.bump(TAROT_CARDS)`` — следующий запрос
+перечитает данные из БД.
+"""
+import asyncio
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.image_variants import load_srcsets
+from app.models import Game, TarotCard
+from app.schemas import GameOut, TarotCardOut
+from app.table_versions import GAMES, IMAGE_VARIANTS, TAROT_CARDS, table_versions
+from app.uploads import source_name_from_url
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    tarot_cards: tuple[TarotCardOut, ...] = ()
+    games: tuple[GameOut, ...] = ()
+    games_by_slug: dict[str, GameOut] = field(default_factory=dict)
+
+
+class Catalog:
+    def __init__(self) -> None:
+        self._version = 0
+        self._snapshot: CatalogSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        """Drop the cached snapshot. Call after the admin transaction is committed."""
+        self._version += 1
+        self._snapshot = None
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            version = self._version
+            snapshot = await _load(db, version)
+            # Инвалидация во время загрузки: отдаём прочитанное, но не кешируем
+            if version == self._version:
+                self._snapshot = snapshot
+            return snapshot
+
+
+async def _load(db: AsyncSession, version: int) -> CatalogSnapshot:
+    result = await db.execute(
+        select(TarotCard).where(TarotCard.is_active).order_by(TarotCard.sort_order, TarotCard.id)
+    )
+    cards = result.scalars().all()
+    srcsets = await load_srcsets(db)
+    tarot_cards = tuple(
+        TarotCardOut.model_validate(c).model_copy(
+            update={"image_srcset": srcsets.get(source_name_from_url(c.image_url), {})}
+        )
+        for c in cards
+    )
+    result = await db.execute(select(Game).where(Game.is_active).order_by(Game.sort_order, Game.id))
+    games = tuple(GameOut.model_validate(g) for g in result.scalars().all())
+    return CatalogSnapshot(
+        version=version,
+        tarot_cards=tarot_cards,
+        games=games,
+        games_by_slug={g.slug: g for g in games},
+    )
+
+
+catalog = Catalog()
+table_versions.subscribe((TAROT_CARDS, GAMES, IMAGE_VARIANTS), catalog.invalidate)
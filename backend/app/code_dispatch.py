@@ -0,0 +1,69 @@
+"""Bulk sending of access codes from the admin panel.
+
+Рассылка кодов всем (или выбранным) девушкам заранее, чтобы не собирать всех
+на ``/api/auth/request-code`` в одну минуту. Письма уходят параллельно через
+``send_code_email`` с ограничением по числу одновременных отправок и по
+частоте; результат по каждому адресату отдаётся по мере готовности.
+"""
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from app.email import send_code_email
+
+# Задачи рассылки живут дольше HTTP-ответа: закрытая вкладка админки не прерывает отправку
+_background: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class Recipient:
+    girl_id: int
+    email: str
+    name: str
+    code: str
+
+
+class RateLimiter:
+    """Spaces out calls to at most ``rate_per_second`` (no limit if rate <= 0)."""
+
+    def __init__(self, rate_per_second: float) -> None:
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def dispatch_codes(
+    recipients: list[Recipient],
+    concurrency: int,
+    rate_per_second: float,
+) -> AsyncIterator[dict]:
+    """Send codes and yield ``{"girl_id", "email", "status", ...}`` per recipient as sends finish."""
+    results: asyncio.Queue[dict] = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    limiter = RateLimiter(rate_per_second)
+
+    async def send_one(r: Recipient) -> None:
+        async with semaphore:
+            await limiter.wait()
+            try:
+                await send_code_email(r.email, r.code, r.name)
+            except Exception as e:
+                await results.put({"girl_id": r.girl_id, "email": r.email, "status": "failed", "error": repr(e)})
+            else:
+                await results.put({"girl_id": r.girl_id, "email": r.email, "status": "sent"})
+
+    for r in recipients:
+        task = asyncio.create_task(send_one(r))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+    for _ in recipients:
+        yield await results.get()
@@ -0,0 +1,42 @@
+"""Periodic cleanup of used and expired access codes.
+
+Удаление идёт маленькими пачками, каждая в своей транзакции с паузой между
+ними, чтобы не держать блокировку записи SQLite дольше нескольких миллисекунд.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, or_, select
+
+from app.config import settings
+from app.database import async_session
+from app.models import AccessCode
+
+PAUSE_BETWEEN_BATCHES_SECONDS = 0.05
+
+
+async def purge_access_codes(batch: int, retention_hours: int) -> int:
+    """Delete codes used or expired more than ``retention_hours`` ago. Returns rows deleted."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    stale = or_(AccessCode.used_at < cutoff, AccessCode.expires_at < cutoff)
+    total = 0
+    while True:
+        async with async_session() as session:
+            ids = select(AccessCode.id).where(stale).limit(batch).scalar_subquery()
+            result = await session.execute(delete(AccessCode).where(AccessCode.id.in_(ids)))
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch:
+            return total
+        await asyncio.sleep(PAUSE_BETWEEN_BATCHES_SECONDS)
+
+
+async def run_purge_loop() -> None:
+    while True:
+        try:
+            n = await purge_access_codes(settings.access_code_purge_batch, settings.access_code_retention_hours)
+            if n:
+                print(f"[CODE PURGE] Deleted {n} used/expired access codes")
+        except Exception as e:
+            print(f"[CODE PURGE] Failed: {e!r}")
+        await asyncio.sleep(settings.access_code_purge_interval_seconds)
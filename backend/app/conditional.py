@@ -0,0 +1,64 @@
+"""Conditional GET for public read endpoints (ETag / Last-Modified -> 304).
+
+ETag строится из версий таблиц (``app/table_versions.py``), поэтому проверка
+``If-None-Match`` не трогает БД и не сериализует ответ. Зависимость
+подключается через ``dependencies=[not_modified(...)]`` и выполняется до
+самого эндпоинта.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.table_versions import table_versions
+
+# Клиент хранит ответ, но перед использованием всегда переспрашивает сервер
+CACHE_CONTROL = "no-cache"
+
+
+def validators(tables: tuple[str, ...]) -> tuple[str, float]:
+    """``(ETag, last modified unix time)`` for the current versions of ``tables``."""
+    versions = ".".join(f"{t}{table_versions.version(t)}" for t in tables)
+    etag = f'W/"{table_versions.epoch}-{versions}"'
+    return etag, max(table_versions.modified_at(t) for t in tables)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Слабое сравнение: W/ не учитывается
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(header: str, modified_at: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified передаётся с точностью до секунды
+    return since is not None and int(modified_at) <= since.timestamp()
+
+
+def not_modified(*tables: str):
+    """Dependency: 304 if the client's copy is current, else set ETag/Last-Modified on the response."""
+
+    async def check(request: Request, response: Response) -> None:
+        etag, modified_at = validators(tables)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modified_at, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+            # Тела этих ответов отдаются сжатыми (app/response_cache.py)
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            fresh = _etag_matches(if_none_match, etag)
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            fresh = if_modified_since is not None and _not_modified_since(if_modified_since, modified_at)
+        if fresh:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    return Depends(check)
@@ -3,7 +3,24 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite+aiosqlite:///./girls.db"
+    # Пул соединений к БД
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    # Профиль SQLite, применяется к каждому соединению (app/database.py). SQLITE_TUNING=false — настройки SQLite по умолчанию
+    sqlite_tuning: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kib: int = 20000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_temp_store: str = "MEMORY"
+    # PostgreSQL (DATABASE_URL=postgresql+asyncpg://...): кеш подготовленных выражений на соединение
+    # (0 — выключить, нужно за pgbouncer в режиме transaction) и имя в pg_stat_activity
+    pg_statement_cache_size: int = 100
+    pg_application_name: str = "girls-api"
     admin_password_hash: str = ""  # set via env ADMIN_PASSWORD_HASH (bcrypt)
+    admin_token_ttl_minutes: int = 60  # срок жизни токена из POST /api/admin/login
     secret_key: str = "change-me-in-production"
     smtp_host: str = ""
     smtp_port: int = 587
@@ -12,8 +29,47 @@ class Settings(BaseSettings):
     smtp_from: str = "noreply@zhdanov.uno"
     # SMTP.BZ REST API (https://docs.smtp.bz/). Если задан — рассылка через API, иначе через SMTP или stub.
     smtp_bz_api_key: str = ""
+    smtp_bz_max_connections: int = 10  # keep-alive соединения к API SMTP.BZ
+    smtp_pool_size: int = 2  # авторизованные SMTP-соединения, переиспользуемые между письмами
     base_url: str = "https://zhdanov.uno/girls"
     code_expire_hours: int = 24
+    # Кеш проверенных JWT и девушек для get_current_girl (app/auth.py)
+    auth_cache_ttl_seconds: float = 300.0
+    auth_cache_max_entries: int = 10000
+    # Очистка использованных и просроченных кодов (app/code_purge.py)
+    access_code_purge_interval_seconds: float = 3600.0
+    access_code_purge_batch: int = 500
+    access_code_retention_hours: int = 24
+    # Фоновая очередь отправки кодов (app/email_queue.py)
+    email_queue_concurrency: int = 4
+    email_queue_max_attempts: int = 3
+    email_queue_retry_base_seconds: float = 2.0
+    email_queue_maxsize: int = 1000
+    email_queue_drain_timeout_seconds: float = 30.0
+    # Буфер аналитики раскладов таро (app/reading_buffer.py)
+    reading_buffer_max_rows: int = 10000
+    reading_buffer_flush_rows: int = 500
+    reading_buffer_flush_interval_ms: int = 1000
+    # Процессы для генерации уменьшенных копий картинок (app/image_variants.py)
+    image_workers: int = 2
+    # Сборщик мусора загрузок не трогает файлы моложе этого срока (scripts/gc_uploads.py)
+    upload_gc_grace_hours: int = 24
+    # Прогрев при старте (app/warmup.py): соединения пула, импорты, каталог, горячие эндпоинты
+    warmup: bool = True
+    warmup_connections: int = 5
+    # Общий для воркеров uvicorn файл версий таблиц (app/table_versions.py), через него
+    # правки в админке сбрасывают кеши во всех процессах. Пусто — в личном каталоге
+    # пользователя <tmp>/girls-<uid> (0700) по хешу DATABASE_URL (путь SQLite — абсолютный)
+    table_versions_file: str = ""
+    # Учёт SQL по запросам (app/query_stats.py): предупреждение в лог сверх бюджета и при повторе
+    # одного запроса N раз (N+1); медленные запросы — в кольцевой буфер GET /api/admin/query-stats
+    query_budget: int = 20
+    n_plus_one_threshold: int = 5
+    slow_query_ms: float = 100.0
+    slow_query_samples: int = 100
+    # Массовая рассылка кодов из админки (значения по умолчанию)
+    dispatch_concurrency: int = 8
+    dispatch_rate_per_second: float = 5.0
 
     class Config:
         env_file = ".env"
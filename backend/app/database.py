@@ -1,11 +1,61 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
+from app.query_stats import instrument_engine
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-)
+
+def sqlite_pragmas() -> list[str]:
+    """Per-connection SQLite profile: WAL lets readers proceed while a write is in progress."""
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA temp_store={settings.sqlite_temp_store}",
+    ]
+
+
+def make_engine(database_url: str | None = None, sqlite_tuning: bool | None = None) -> AsyncEngine:
+    url = make_url(database_url or settings.database_url)
+    if sqlite_tuning is None:
+        sqlite_tuning = settings.sqlite_tuning
+    kwargs = {}
+    is_sqlite = url.get_backend_name() == "sqlite"
+    # In-memory SQLite uses a single static connection — pool sizing does not apply
+    if not is_sqlite or url.database not in (None, "", ":memory:"):
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    if url.get_backend_name() == "postgresql" and url.get_driver_name() == "asyncpg":
+        # Кеш подготовленных выражений: SQLAlchemy поверх asyncpg и сам asyncpg (0 — выключить, для pgbouncer)
+        if "prepared_statement_cache_size" not in url.query:
+            url = url.update_query_dict({"prepared_statement_cache_size": str(settings.pg_statement_cache_size)})
+        kwargs["connect_args"] = {
+            "statement_cache_size": settings.pg_statement_cache_size,
+            "server_settings": {"application_name": settings.pg_application_name},
+        }
+    new_engine = create_async_engine(url, echo=False, **kwargs)
+    if is_sqlite and sqlite_tuning:
+        pragmas = sqlite_pragmas()
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
+
+engine = make_engine()
+# Запросы приложения засчитываются HTTP-запросам (Server-Timing, GET /api/admin/query-stats)
+instrument_engine(engine)
 
 async_session = async_sessionmaker(
     engine,
@@ -20,6 +70,15 @@ class Base(DeclarativeBase):
     pass
 
 
+def upsert_insert(bind):
+    """Dialect-specific ``insert`` construct that supports ``on_conflict_do_update``."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
 async def get_db():
     async with async_session() as session:
         try:
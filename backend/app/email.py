@@ -1,4 +1,7 @@
 import asyncio
+import time
+from contextlib import asynccontextmanager
+
 from app.config import settings
 
 
@@ -57,11 +60,111 @@ def _code_email_html(girl_name: str, code: str) -> str:
 </html>"""
 
 
+SMTPBZ_SEND_URL = "https://api.smtp.bz/v1/smtp/send"
+# Соединение из пула, простоявшее дольше этого, проверяется NOOP перед использованием
+SMTP_HEALTHCHECK_AFTER_SECONDS = 30.0
+
+
+class MailTransport:
+    """Long-lived connections to the mail provider.
+
+    A keep-alive ``httpx.AsyncClient`` for the SMTP.BZ API and a small pool of
+    connected, authenticated SMTP sessions. Opened in the app lifespan; when
+    used without it (scripts) connections are created on first use.
+    """
+
+    def __init__(self, smtp_pool_size: int, http_max_connections: int) -> None:
+        self.http_max_connections = http_max_connections
+        self._http = None
+        self._smtp_idle: list[tuple[object, float]] = []
+        self._smtp_slots = asyncio.Semaphore(max(smtp_pool_size, 1))
+
+    async def start(self) -> None:
+        """Create the API client (or import the SMTP client) so the first email does not pay for it."""
+        if settings.smtp_bz_api_key:
+            self.http_client()
+        elif settings.smtp_host:
+            import aiosmtplib  # noqa: F401
+            import email.message  # noqa: F401
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        while self._smtp_idle:
+            smtp, _ = self._smtp_idle.pop()
+            await _close_smtp(smtp)
+
+    def http_client(self):
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(
+                    max_connections=self.http_max_connections,
+                    max_keepalive_connections=self.http_max_connections,
+                ),
+            )
+        return self._http
+
+    @asynccontextmanager
+    async def smtp_connection(self):
+        """Borrow an authenticated SMTP connection; it is discarded if the caller fails."""
+        await self._smtp_slots.acquire()
+        smtp = None
+        try:
+            smtp = await self._acquire_smtp()
+            yield smtp
+        except BaseException:
+            if smtp is not None:
+                await _close_smtp(smtp)
+            raise
+        else:
+            self._smtp_idle.append((smtp, time.monotonic()))
+        finally:
+            self._smtp_slots.release()
+
+    async def _acquire_smtp(self):
+        while self._smtp_idle:
+            smtp, last_used = self._smtp_idle.pop()
+            if not smtp.is_connected:
+                continue
+            if time.monotonic() - last_used < SMTP_HEALTHCHECK_AFTER_SECONDS:
+                return smtp
+            try:
+                await smtp.noop()
+                return smtp
+            except Exception:
+                await _close_smtp(smtp)
+        import aiosmtplib
+
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.smtp_host,
+            port=settings.smtp_port,
+            username=settings.smtp_user or None,
+            password=settings.smtp_password or None,
+            use_tls=True,
+        )
+        await smtp.connect()
+        return smtp
+
+
+async def _close_smtp(smtp) -> None:
+    try:
+        await smtp.quit()
+    except Exception:
+        smtp.close()
+
+
+mail_transport = MailTransport(
+    smtp_pool_size=settings.smtp_pool_size,
+    http_max_connections=settings.smtp_bz_max_connections,
+)
+
+
 async def _send_via_smtpbz(to_email: str, code: str, girl_name: str) -> None:
     """Send via SMTP.BZ REST API: POST https://api.smtp.bz/v1/smtp/send (multipart/form-data)."""
-    import httpx
-
-    url = "https://api.smtp.bz/v1/smtp/send"
     # SMTP.BZ expects raw API key in Authorization header, not "Bearer <key>" (Swagger: apiKey in header)
     headers = {"Authorization": settings.smtp_bz_api_key.strip()}
     data = {
@@ -72,15 +175,13 @@ async def _send_via_smtpbz(to_email: str, code: str, girl_name: str) -> None:
         "html": _code_email_html(girl_name, code),
         "text": _code_email_text(girl_name, code),
     }
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(url, data=data, headers=headers)
-        resp.raise_for_status()
+    resp = await mail_transport.http_client().post(SMTPBZ_SEND_URL, data=data, headers=headers)
+    resp.raise_for_status()
 
 
 async def _send_via_smtp(to_email: str, code: str, girl_name: str) -> None:
-    """Send via classic SMTP (aiosmtplib)."""
+    """Send via classic SMTP (aiosmtplib), reusing a pooled connection."""
     try:
-        import aiosmtplib
         from email.message import EmailMessage
 
         msg = EmailMessage()
@@ -88,14 +189,8 @@ async def _send_via_smtp(to_email: str, code: str, girl_name: str) -> None:
         msg["From"] = settings.smtp_from
         msg["To"] = to_email
         msg.set_content(_code_email_text(girl_name, code))
-        await aiosmtplib.send(
-            msg,
-            hostname=settings.smtp_host,
-            port=settings.smtp_port,
-            username=settings.smtp_user or None,
-            password=settings.smtp_password or None,
-            use_tls=True,
-        )
+        async with mail_transport.smtp_connection() as smtp:
+            await smtp.send_message(msg)
     except Exception as e:
         print(f"Send email error: {e}")
         raise
@@ -0,0 +1,172 @@
+"""In-process background queue for access-code emails.
+
+``request_code`` only enqueues the message; a fixed number of worker tasks
+deliver it through ``send_code_email`` with retries and exponential backoff.
+Messages that exhaust their attempts, and those not delivered when shutdown
+times out (still queued, being sent or waiting for a retry), go to a bounded
+dead-letter list exposed via the admin API.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from app.config import settings
+from app.email import send_code_email
+from app.query_stats import untracked
+
+
+@dataclass
+class EmailJob:
+    to_email: str
+    code: str
+    girl_name: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+@dataclass
+class DeadLetter:
+    to_email: str
+    girl_name: str
+    attempts: int
+    error: str
+    failed_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class EmailQueue:
+    def __init__(
+        self,
+        concurrency: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        maxsize: int,
+    ) -> None:
+        self.concurrency = max(concurrency, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_base_seconds = retry_base_seconds
+        self.maxsize = maxsize
+        self._queue: asyncio.Queue[EmailJob] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._in_flight = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dead_letters: deque[DeadLetter] = deque(maxlen=100)
+        # Время от постановки в очередь до успешной отправки, секунды
+        self._latencies: deque[float] = deque(maxlen=1000)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [asyncio.create_task(untracked(self._worker())) for _ in range(self.concurrency)]
+
+    def enqueue(self, to_email: str, code: str, girl_name: str) -> bool:
+        """Queue a code email. Returns False if the queue is full."""
+        if not self.running:
+            self.start()
+        try:
+            self._queue.put_nowait(EmailJob(to_email=to_email, code=code, girl_name=girl_name))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def stop(self, timeout: float) -> None:
+        """Wait up to ``timeout`` seconds for queued mail to be delivered, then stop workers.
+
+        Whatever is left — queued jobs and jobs the cancelled workers were sending
+        or waiting to retry — is dead-lettered.
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                self._dead_letter(job, "not delivered before shutdown")
+                self._queue.task_done()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 1)
+
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": self._in_flight,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0)},
+            "dead_letters": [
+                {
+                    "to_email": d.to_email,
+                    "girl_name": d.girl_name,
+                    "attempts": d.attempts,
+                    "error": d.error,
+                    "failed_at": d.failed_at.isoformat(),
+                }
+                for d in self.dead_letters
+            ],
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            try:
+                await self._deliver(job)
+            except asyncio.CancelledError:
+                # Остановка по таймауту: письмо в отправке или ждёт повтора — не терять молча
+                self._dead_letter(job, "not delivered before shutdown")
+                raise
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    async def _deliver(self, job: EmailJob) -> None:
+        while True:
+            job.attempts += 1
+            try:
+                await send_code_email(job.to_email, job.code, job.girl_name)
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    self._dead_letter(job, repr(e))
+                    return
+                self.retried += 1
+                await asyncio.sleep(self.retry_base_seconds * 2 ** (job.attempts - 1))
+                continue
+            self.sent += 1
+            self._latencies.append(time.monotonic() - job.enqueued_at)
+            return
+
+    def _dead_letter(self, job: EmailJob, error: str) -> None:
+        self.failed += 1
+        self.dead_letters.append(
+            DeadLetter(to_email=job.to_email, girl_name=job.girl_name, attempts=job.attempts, error=error)
+        )
+        print(f"[EMAIL QUEUE] Giving up on {job.to_email} after {job.attempts} attempt(s): {error}")
+
+
+email_queue = EmailQueue(
+    concurrency=settings.email_queue_concurrency,
+    max_attempts=settings.email_queue_max_attempts,
+    retry_base_seconds=settings.email_queue_retry_base_seconds,
+    maxsize=settings.email_queue_maxsize,
+)
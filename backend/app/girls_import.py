@@ -0,0 +1,142 @@
+"""Bulk import of girls from CSV or NDJSON.
+
+Файл читается построчно (в памяти только текущая пачка), каждая строка
+валидируется через ``GirlCreate``, валидные строки вставляются пачками с
+upsert по ``email``. Если файл дальше оказался не в UTF-8, уже прочитанные
+строки сохраняются, а отчёт получает ошибку с номером строки и ``stopped``:
+к этому моменту предыдущие пачки уже закоммичены. Используется эндпоинтом ``POST /api/admin/girls/import``
+и скриптом ``scripts/import_girls.py``.
+"""
+import asyncio
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import upsert_insert
+from app.models import Girl
+from app.schemas import GirlCreate
+
+FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    error_count: int = 0
+    errors: list[dict] = field(default_factory=list)
+    # Чтение прервано (файл не в UTF-8): processed — сколько строк до этого сохранено
+    stopped: bool = False
+
+    def add_error(self, line: int, error: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "stopped": self.stopped,
+        }
+
+
+def detect_format(filename: str | None) -> str | None:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def iter_rows(lines: Iterable[str], fmt: str, report: ImportReport) -> Iterator[tuple[int, dict]]:
+    """Yield ``(line_number, raw_row)``; unparsable lines are recorded in ``report``."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            report.add_error(line_no, f"Invalid JSON: {e.msg}")
+            continue
+        if not isinstance(row, dict):
+            report.add_error(line_no, "Expected a JSON object")
+            continue
+        yield line_no, row
+
+
+def _upsert_statement(db: AsyncSession):
+    stmt = upsert_insert(db.bind)(Girl)
+    return stmt.on_conflict_do_update(
+        index_elements=[Girl.email],
+        set_={"name": stmt.excluded.name, "gift_certificate_url": stmt.excluded.gift_certificate_url},
+    )
+
+
+async def _flush_chunk(db: AsyncSession, chunk: dict[str, dict]) -> None:
+    if chunk:
+        await db.execute(_upsert_statement(db), list(chunk.values()))
+        await db.commit()
+
+
+def _read_chunk(
+    rows: Iterator[tuple[int, dict]],
+    report: ImportReport,
+    chunk_size: int,
+) -> tuple[dict[str, dict], bool]:
+    """Validate up to ``chunk_size`` rows. Returns ``(email -> row, exhausted)``."""
+    # Повтор email внутри пачки — побеждает последняя строка
+    chunk: dict[str, dict] = {}
+    line_no = 0
+    try:
+        for line_no, row in rows:
+            try:
+                data = GirlCreate.model_validate(row)
+            except ValidationError as e:
+                report.add_error(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            chunk[data.email] = {
+                "name": data.name,
+                "email": data.email,
+                "gift_certificate_url": data.gift_certificate_url or None,
+            }
+            report.processed += 1
+            if len(chunk) >= chunk_size:
+                return chunk, False
+    except UnicodeDecodeError:
+        # Файл декодируется по ходу чтения: строки до ошибки сохраняем, дальше не читаем
+        report.add_error(line_no + 1, "Файл должен быть в UTF-8, импорт остановлен")
+        report.stopped = True
+    return chunk, True
+
+
+async def import_girls(
+    db: AsyncSession,
+    lines: Iterable[str],
+    fmt: str,
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportReport:
+    """Validate rows and upsert them by email, committing every ``chunk_size`` rows.
+
+    Reading and validation (e-mail checks dominate the CPU cost) run in a worker
+    thread chunk by chunk, so the event loop stays free between DB batches.
+    """
+    report = ImportReport()
+    rows = iter_rows(lines, fmt, report)
+    exhausted = False
+    while not exhausted:
+        chunk, exhausted = await asyncio.to_thread(_read_chunk, rows, report, chunk_size)
+        await _flush_chunk(db, chunk)
+    return report
@@ -0,0 +1,80 @@
+"""Движок «Гороскопа на день»: предрасчитанные префиксы и кеш предсказаний.
+
+Префиксы «[знак род.] [роль род.] ждёт:» для всех комбинаций ролей и знаков
+считаются при импорте, тексты активных предсказаний хранятся в памяти уже
+разбитыми на слова. После первой загрузки рендер — чистая работа CPU без
+запросов к БД; кеш сбрасывается при ``table_versions.bump(HOROSCOPE_PREDICTIONS)``.
+"""
+import asyncio
+import random
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.horoscope_data import ROLES, SIGNS, EASTER_EGG_PHRASES
+from app.models import HoroscopePrediction
+from app.table_versions import HOROSCOPE_PREDICTIONS, table_versions
+
+EASTER_EGG_START = "{{EASTER}}"
+EASTER_EGG_END = "{{/EASTER}}"
+
+_WRAPPED_EASTER_EGGS: tuple[str, ...] = tuple(
+    f"{EASTER_EGG_START}{phrase.strip()}{EASTER_EGG_END}" for phrase in EASTER_EGG_PHRASES
+)
+
+# (role_id, sign_id) -> слова фразы «[Знак род.] [роль род.] ждёт:»
+PREFIXES: dict[tuple[str, str], tuple[str, ...]] = {
+    (role["id"], sign["id"]): tuple(f"{sign['label_rod']} {role['label_rod']} ждёт:".split())
+    for role in ROLES
+    for sign in SIGNS
+}
+
+
+def insert_easter_egg(words: list[str]) -> str:
+    """Вставляет несколько пасхалок (2–4) в список слов, каждая в маркерах для стилизации на фронте."""
+    if not _WRAPPED_EASTER_EGGS:
+        return " ".join(words)
+    if len(words) < 2:
+        return " ".join(words) + " " + random.choice(_WRAPPED_EASTER_EGGS)
+    for _ in range(random.randint(2, 4)):
+        words.insert(random.randint(0, len(words)), random.choice(_WRAPPED_EASTER_EGGS))
+    return " ".join(words)
+
+
+class HoroscopeEngine:
+    def __init__(self) -> None:
+        self._version = 0
+        self._pool: tuple[tuple[str, ...], ...] | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Drop cached predictions. Call after the admin transaction is committed."""
+        self._version += 1
+        self._pool = None
+
+    async def predictions(self, db: AsyncSession) -> tuple[tuple[str, ...], ...]:
+        """Active predictions, each pre-split into words (in sort order)."""
+        pool = self._pool
+        if pool is not None:
+            return pool
+        async with self._lock:
+            if self._pool is not None:
+                return self._pool
+            version = self._version
+            result = await db.execute(
+                select(HoroscopePrediction.text)
+                .where(HoroscopePrediction.is_active)
+                .order_by(HoroscopePrediction.sort_order, HoroscopePrediction.id)
+            )
+            pool = tuple(tuple(text.split()) for text in result.scalars().all())
+            if version == self._version:
+                self._pool = pool
+            return pool
+
+    @staticmethod
+    def render(prefix: tuple[str, ...], pool: tuple[tuple[str, ...], ...]) -> str:
+        return insert_easter_egg([*prefix, *random.choice(pool)])
+
+
+horoscope_engine = HoroscopeEngine()
+table_versions.subscribe((HOROSCOPE_PREDICTIONS,), horoscope_engine.invalidate)
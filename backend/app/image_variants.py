@@ -0,0 +1,120 @@
+"""Resized WebP/JPEG variants of uploaded images.
+
+После загрузки картинки её уменьшенные копии (несколько ширин, WebP и JPEG)
+считаются в ``ProcessPoolExecutor`` — работа Pillow не занимает event loop и
+GIL процесса API. Варианты записываются в таблицу ``image_variants``, каталог
+отдаёт их в ``TarotCardOut.image_srcset``. Для уже загруженных файлов —
+``scripts/backfill_image_variants.py``.
+"""
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import delete, insert, select
+
+from app.config import settings
+from app.database import async_session
+from app.models import ImageVariant
+from app.query_stats import untracked
+from app.uploads import UPLOADS_DIR, UPLOADS_URL, VARIANTS_DIR
+WIDTHS = (320, 640, 1024)
+# format -> (расширение файла, параметры Pillow)
+FORMATS = {
+    "webp": (".webp", {"quality": 80, "method": 4}),
+    "jpeg": (".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None  # ProcessPoolExecutor, создаётся при первой загрузке картинки
+# Фоновые задачи генерации после загрузки (ссылки держим, чтобы их не собрал GC)
+_background: set[asyncio.Task] = set()
+
+
+def render_variants(source_path: str, out_dir: str) -> list[dict]:
+    """Runs in a worker process. Returns ``[{"width", "format", "name"}]``; never upscales."""
+    from PIL import Image, ImageOps
+
+    source = Path(source_path)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    variants = []
+    with Image.open(source) as img:
+        # У GIF берём первый кадр; фото с телефона поворачиваем по EXIF — save() тег не сохраняет
+        rgba = ImageOps.exif_transpose(img).convert("RGBA")
+    for width in WIDTHS:
+        if width >= rgba.width:
+            break
+        height = max(round(rgba.height * width / rgba.width), 1)
+        resized = rgba.resize((width, height), Image.LANCZOS)
+        for fmt, (ext, options) in FORMATS.items():
+            name = f"{source.stem}-{width}w{ext}"
+            if fmt == "jpeg":
+                # JPEG без альфа-канала: прозрачное — на белом фоне
+                frame = Image.alpha_composite(Image.new("RGBA", resized.size, "white"), resized).convert("RGB")
+            else:
+                frame = resized
+            frame.save(out / name, fmt.upper(), **options)
+            variants.append({"width": width, "format": fmt, "name": name})
+    return variants
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn, а не fork: процесс API многопоточный (to_thread, aiosqlite)
+        _executor = ProcessPoolExecutor(max_workers=settings.image_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def generate_variants(source_name: str) -> list[dict]:
+    """Render variants of ``static/uploads/<source_name>`` and record them in the database."""
+    loop = asyncio.get_running_loop()
+    variants = await loop.run_in_executor(
+        _get_executor(), render_variants, str(UPLOADS_DIR / source_name), str(VARIANTS_DIR)
+    )
+    async with async_session() as session:
+        await session.execute(delete(ImageVariant).where(ImageVariant.source_name == source_name))
+        if variants:
+            await session.execute(insert(ImageVariant), [{"source_name": source_name, **v} for v in variants])
+        await session.commit()
+    return variants
+
+
+def generate_in_background(source_name: str, on_done=None) -> None:
+    """Schedule ``generate_variants`` without waiting; ``on_done()`` runs after success."""
+
+    async def run():
+        try:
+            await generate_variants(source_name)
+        except Exception as e:
+            print(f"[IMAGE VARIANTS] {source_name}: {e!r}")
+            return
+        if on_done is not None:
+            on_done()
+
+    task = asyncio.create_task(untracked(run()))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def load_srcsets(session) -> dict[str, dict[str, str]]:
+    """source_name -> {format: "url 320w, url 640w, ..."} for all recorded variants."""
+    rows = (
+        await session.execute(
+            select(ImageVariant.source_name, ImageVariant.format, ImageVariant.width, ImageVariant.name).order_by(
+                ImageVariant.source_name, ImageVariant.format, ImageVariant.width
+            )
+        )
+    ).all()
+    srcsets: dict[str, dict[str, list[str]]] = {}
+    for source_name, fmt, width, name in rows:
+        srcsets.setdefault(source_name, {}).setdefault(fmt, []).append(f"{UPLOADS_URL}/variants/{name} {width}w")
+    return {src: {fmt: ", ".join(items) for fmt, items in by_fmt.items()} for src, by_fmt in srcsets.items()}
@@ -1,21 +1,64 @@
 from __future__ import annotations
-from pathlib import Path
+import asyncio
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.code_purge import run_purge_loop
+from app.config import settings
 from app.database import get_db
+from app.email import mail_transport
+from app.email_queue import email_queue
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, metrics
+from app.profiler import profiler
+from app.query_stats import QueryStatsMiddleware, query_stats
+from app import image_variants
+from app.reading_buffer import reading_buffer
 from app.routers import public, admin
+from app.table_versions import TableVersionsMiddleware, shared_file_path, table_versions
+from app.tarot_stats import catch_up
+from app.uploads import UPLOADS_DIR, UploadsStaticFiles
+from app.warmup import warm_up
 
-app = FastAPI(title="8 Марта — Girls", root_path="/girls")
 
-# Static uploads (tarot card images)
-STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
-UPLOADS_DIR = STATIC_DIR / "uploads"
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Версии таблиц общие для всех воркеров: правка в админке одного сбрасывает кеши остальных
+    table_versions.share(shared_file_path())
+    await mail_transport.start()
+    email_queue.start()
+    reading_buffer.start()
+    # Догон аналитики по раскладам, накопленным до старта
+    rollup_catch_up = asyncio.create_task(catch_up())
+    code_purge = asyncio.create_task(run_purge_loop())
+    if settings.warmup:
+        # Первые запросы после рестарта не должны платить за соединения, импорты и пустые кеши
+        try:
+            timings = await warm_up(app)
+            print("[WARMUP] " + ", ".join(f"{step} {ms} ms" for step, ms in timings.items()))
+        except Exception as e:
+            print(f"[WARMUP] failed: {e!r}")
+    yield
+    profiler.stop()
+    for task in (rollup_catch_up, code_purge):
+        task.cancel()
+    await asyncio.gather(rollup_catch_up, code_purge, return_exceptions=True)
+    await reading_buffer.stop()
+    await email_queue.stop(settings.email_queue_drain_timeout_seconds)
+    await mail_transport.close()
+    await asyncio.to_thread(image_variants.shutdown)
+    table_versions.close()
+
+
+app = FastAPI(title="8 Марта — Girls", root_path="/girls", lifespan=lifespan)
+
+# Static uploads (tarot card images); content-addressed files are served as immutable
+STATIC_DIR = UPLOADS_DIR.parent
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+app.mount("/static", UploadsStaticFiles(directory=str(STATIC_DIR)), name="static")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -23,9 +66,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TableVersionsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+# Последним — самый внешний: время запроса включает остальные middleware
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 app.include_router(public.router)
 app.include_router(admin.router)
+# Профилирование по запросу из админки: оборачивает middleware-стек только на время сессии
+profiler.attach(app)
 
 
 @app.get("/api/health")
@@ -33,6 +82,12 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Request counts, in-flight requests and latency histograms per route (Prometheus text format)."""
+    return Response(metrics.render() + query_stats.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/certificate/{token}")
 async def get_certificate_by_token(token: str, db: AsyncSession = Depends(get_db)):
     """Public view: get certificate info by token (for the certificate page)."""
@@ -0,0 +1,127 @@
+"""Per-route request metrics in Prometheus text format (``GET /api/metrics``).
+
+Чистый ASGI-middleware: на запрос — два вызова ``perf_counter``, ``bisect`` по
+фиксированным корзинам и несколько инкрементов в словарях, без блокировок
+(всё в одном event loop). Маршрут берётся из шаблона пути FastAPI
+(``/api/games/{slug}``), поэтому число меток не растёт от значений в URL;
+нестандартные HTTP-методы сводятся в ``OTHER`` по той же причине.
+"""
+import time
+from bisect import bisect_left
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Верхние границы корзин гистограммы, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = "<unmatched>"
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OTHER_METHOD = "OTHER"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        # Последняя ячейка — больше верхней границы (+Inf)
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.in_progress = 0
+        # (method, route, status class) -> число ответов
+        self.requests: dict[tuple[str, str, str], int] = {}
+        # (method, route) -> гистограмма длительности
+        self.latency: dict[tuple[str, str], Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        if method not in METHODS:
+            # Метод присылает клиент: произвольные значения не должны плодить серии
+            method = OTHER_METHOD
+        key = (method, route, f"{status // 100}xx")
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram()
+        histogram.observe(seconds)
+
+    def clear(self) -> None:
+        self.requests.clear()
+        self.latency.clear()
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_progress Requests currently being handled.",
+            "# TYPE http_requests_in_progress gauge",
+            f"http_requests_in_progress {self.in_progress}",
+            "# HELP http_requests_total Completed requests by route and status class.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), n in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{_escape(method)}",route="{_escape(route)}",status="{status}"}} {n}')
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), h in sorted(self.latency.items()):
+            labels = f'method="{_escape(method)}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, n in zip((*BUCKETS, "+Inf"), h.counts):
+                cumulative += n
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {h.total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def route_label(scope: Scope) -> str:
+    """Route template after routing: APIRoute path, ``<mount>/{path}`` for mounts, else UNMATCHED."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("endpoint") is not None:
+        # Mount (статика): root_path дочернего scope — путь монтирования
+        return scope["root_path"][len(scope.get("app_root_path", "")) :] + "/{path}"
+    return UNMATCHED
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_progress -= 1
+            metrics.observe(scope["method"], route_label(scope), status, time.perf_counter() - start)
+
+
+metrics = Metrics()
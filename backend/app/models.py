@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey, Integer, Boolean, Text
+from sqlalchemy import String, DateTime, ForeignKey, Index, Integer, Boolean, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -20,6 +20,8 @@ class Girl(Base):
 
 class AccessCode(Base):
     __tablename__ = "access_codes"
+    # Покрывает условие verify_code: girl_id, code, used_at IS NULL, expires_at > now
+    __table_args__ = (Index("ix_access_codes_verify", "girl_id", "code", "used_at", "expires_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     girl_id: Mapped[int] = mapped_column(ForeignKey("girls.id"), nullable=False)
@@ -74,7 +76,35 @@ class TarotReading(Base):
     past_card_uuid: Mapped[str] = mapped_column(String(64), nullable=False)
     present_card_uuid: Mapped[str] = mapped_column(String(64), nullable=False)
     future_card_uuid: Mapped[str] = mapped_column(String(64), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TarotCardCounter(Base):
+    """Rollup: how many times a card was drawn in a position (past / present / future)."""
+
+    __tablename__ = "tarot_card_counters"
+
+    card_uuid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    position: Mapped[str] = mapped_column(String(16), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class TarotHourlyCounter(Base):
+    """Rollup: number of readings per hour (UTC)."""
+
+    __tablename__ = "tarot_hourly_counters"
+
+    hour: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class TarotRollupState(Base):
+    """Single row: id of the last TarotReading already counted in the rollups."""
+
+    __tablename__ = "tarot_rollup_state"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_reading_id: Mapped[int] = mapped_column(Integer, default=0)
 
 
 class HoroscopePrediction(Base):
@@ -86,3 +116,16 @@ class HoroscopePrediction(Base):
     sort_order: Mapped[int] = mapped_column(Integer, default=0)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ImageVariant(Base):
+    """Resized copy of an uploaded image (static/uploads/variants/<name>)."""
+
+    __tablename__ = "image_variants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source_name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    format: Mapped[str] = mapped_column(String(16), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,159 @@
+"""On-demand sampling profiler for live endpoints (admin: ``/api/admin/profile``).
+
+Пока сессия не запущена, профайлер не участвует в обработке запросов вовсе:
+на время сессии он оборачивает ``app.middleware_stack``, а по её окончании
+возвращает исходный стек. Доля ``sample_rate`` запросов к выбранным маршрутам
+помечается; таймер ``ITIMER_PROF`` присылает SIGPROF раз в ``interval_ms``
+процессорного времени, и обработчик в главном потоке (там работает event
+loop) засчитывает стек от middleware до текущей функции, если сейчас
+выполняется помеченный запрос.
+
+``ITIMER_PROF`` считает CPU всего процесса, включая потоки aiosqlite,
+``to_thread`` (bcrypt) и Pillow, поэтому сигналы приходят чаще, когда они
+заняты. Сэмпл берётся, только когда сам поток event loop набрал ``interval_ms``
+CPU (``time.thread_time``): частота сэмплов от фоновой нагрузки не зависит, а
+лишние сигналы стоят одного вызова ``thread_time``. Это время на CPU в event
+loop: ожидание БД и сети в стеки не попадает. Результат — collapsed stacks
+(``маршрут;функция;...;функция N``), формат flamegraph.pl / speedscope.
+"""
+import asyncio
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import route_label
+
+MAX_DURATION_SECONDS = 600
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class _SamplingMiddleware:
+    def __init__(self, app: ASGIApp, profiler: "Profiler") -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or random.random() >= self.profiler.sample_rate:
+            await self.app(scope, receive, send)
+            return
+        # Кадр этой корутины — граница стека запроса для обработчика SIGPROF
+        frame = sys._getframe()
+        self.profiler.active[frame] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            del self.profiler.active[frame]
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self._app: FastAPI | None = None
+        self._original: ASGIApp | None = None
+        self._previous_handler = None
+        self._expire_handle: asyncio.TimerHandle | None = None
+        self.active: dict[FrameType, Scope] = {}
+        self.routes: frozenset[str] | None = None
+        self.sample_rate = 0.0
+        self.interval = 0.005
+        self.started_at: float | None = None
+        self.deadline: float | None = None
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        # CPU потока event loop, до которого сэмплы уже засчитаны
+        self._loop_cpu = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._original is not None
+
+    def attach(self, app: FastAPI) -> None:
+        self._app = app
+
+    def start(self, routes: list[str] | None, sample_rate: float, duration: float, interval_ms: float) -> None:
+        """Begin a session. Must run on the event loop in the main thread (signal handlers live there)."""
+        if self.running:
+            raise RuntimeError("profiling session already running")
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("profiling needs the event loop in the main thread")
+        app = self._app
+        if app.middleware_stack is None:
+            app.middleware_stack = app.build_middleware_stack()
+        self.routes = frozenset(routes) if routes else None
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.interval = min(max(interval_ms, 1.0), 100.0) / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._loop_cpu = time.thread_time()
+        self.started_at = time.time()
+        duration = min(max(duration, 1.0), MAX_DURATION_SECONDS)
+        self.deadline = time.monotonic() + duration
+        self._original = app.middleware_stack
+        app.middleware_stack = _SamplingMiddleware(self._original, self)
+        self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self._expire_handle = asyncio.get_running_loop().call_later(duration, self.stop)
+
+    def stop(self) -> None:
+        """End the session and unhook the middleware; results stay until the next start."""
+        if self._original is None:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self._app.middleware_stack = self._original
+        self._original = None
+        if self._expire_handle is not None:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+
+    def _on_signal(self, signum, frame: FrameType | None) -> None:
+        # Обработчик выполняется в главном потоке: thread_time — CPU самого event loop
+        loop_cpu = time.thread_time()
+        if loop_cpu - self._loop_cpu < self.interval:
+            return
+        # Не копим долг: после долгого промежутка — один сэмпл, а не серия подряд
+        self._loop_cpu = max(self._loop_cpu + self.interval, loop_cpu - self.interval)
+        if not self.active:
+            return
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            scope = self.active.get(frame)
+            if scope is not None:
+                route = route_label(scope)
+                if self.routes is None or route in self.routes:
+                    labels.append(f"{scope['method']} {route}")
+                    self.stacks[";".join(reversed(labels))] += 1
+                    self.samples += 1
+                return
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "routes": sorted(self.routes) if self.routes else None,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "seconds_left": max(round(self.deadline - time.monotonic(), 1), 0) if self.running else 0,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+        }
+
+
+profiler = Profiler()
@@ -0,0 +1,212 @@
+"""SQL instrumentation: queries and DB time per request and per route.
+
+Хуки ``before/after_cursor_execute`` на движке из ``app/database.py``
+засчитывают каждый запрос текущему HTTP-запросу через contextvar (SQLAlchemy
+переносит контекст в свои greenlet'ы). Middleware отдаёт итог в заголовке
+``Server-Timing``, копит агрегаты по маршрутам и пишет в лог запросы сверх
+бюджета ``QUERY_BUDGET`` и повторы одного и того же SQL (N+1). Медленные
+запросы попадают в кольцевой буфер с нормализованным SQL.
+"""
+import re
+import time
+from collections import Counter, deque
+from collections.abc import Coroutine
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.metrics import route_label
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))+\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace, literals and IN-lists so equal-shaped statements compare equal."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _IN_LIST.sub("(?, ...)", statement)
+    return _LITERAL.sub("?", statement)
+
+
+@dataclass
+class RequestQueries:
+    count: int = 0
+    seconds: float = 0.0
+    # SQL с плейсхолдерами -> сколько раз выполнен в этом запросе
+    statements: Counter = field(default_factory=Counter)
+    slow: list["SlowQuery"] = field(default_factory=list)
+
+
+@dataclass
+class RouteQueries:
+    requests: int = 0
+    queries: int = 0
+    seconds: float = 0.0
+    max_queries: int = 0
+    over_budget: int = 0
+
+
+@dataclass(frozen=True)
+class SlowQuery:
+    sql: str
+    ms: float
+    route: str | None
+    at: datetime
+
+
+current_queries: ContextVar[RequestQueries | None] = ContextVar("current_queries", default=None)
+
+
+def untracked(coro: Coroutine) -> Coroutine:
+    """Wrap a coroutine started from a request (``create_task``) so its queries count as untracked.
+
+    Задача наследует контекст запроса, который к моменту её запросов уже завершён.
+    """
+
+    async def run():
+        current_queries.set(None)
+        return await coro
+
+    return run()
+
+
+class QueryStats:
+    def __init__(self, slow_samples: int) -> None:
+        self.routes: dict[tuple[str, str], RouteQueries] = {}
+        self.slow: deque[SlowQuery] = deque(maxlen=slow_samples)
+        self.untracked = 0
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        stats = current_queries.get()
+        if stats is None:
+            # Фоновые задачи: буфер раскладов, очередь писем, догон аналитики
+            self.untracked += 1
+        else:
+            stats.count += 1
+            stats.seconds += seconds
+            stats.statements[statement] += 1
+        if seconds * 1000 >= settings.slow_query_ms:
+            slow = SlowQuery(sql=normalize_sql(statement), ms=round(seconds * 1000, 2), route=None, at=datetime.utcnow())
+            # Маршрут запроса известен только по его завершении (record_request)
+            (self.slow if stats is None else stats.slow).append(slow)
+
+    def record_request(self, method: str, route: str, stats: RequestQueries) -> None:
+        agg = self.routes.get((method, route))
+        if agg is None:
+            agg = self.routes[(method, route)] = RouteQueries()
+        agg.requests += 1
+        agg.queries += stats.count
+        agg.seconds += stats.seconds
+        agg.max_queries = max(agg.max_queries, stats.count)
+        self.slow.extend(replace(s, route=f"{method} {route}") for s in stats.slow)
+        if stats.count > settings.query_budget:
+            agg.over_budget += 1
+            print(
+                f"[QUERY BUDGET] {method} {route}: {stats.count} queries "
+                f"(budget {settings.query_budget}), {stats.seconds * 1000:.1f} ms in DB"
+            )
+        if stats.statements:
+            statement, repeats = stats.statements.most_common(1)[0]
+            if repeats >= settings.n_plus_one_threshold:
+                print(f"[N+1] {method} {route}: same statement x{repeats}: {normalize_sql(statement)[:200]}")
+
+    def clear(self) -> None:
+        self.routes.clear()
+        self.slow.clear()
+        self.untracked = 0
+
+    def stats(self) -> dict:
+        routes = sorted(self.routes.items(), key=lambda item: item[1].seconds, reverse=True)
+        return {
+            "query_budget": settings.query_budget,
+            "untracked_queries": self.untracked,
+            "routes": [
+                {
+                    "method": method,
+                    "route": route,
+                    "requests": agg.requests,
+                    "queries_per_request": round(agg.queries / agg.requests, 2),
+                    "db_ms_per_request": round(agg.seconds * 1000 / agg.requests, 3),
+                    "db_ms_total": round(agg.seconds * 1000, 1),
+                    "max_queries": agg.max_queries,
+                    "over_budget": agg.over_budget,
+                }
+                for (method, route), agg in routes
+            ],
+            "slow_queries": [
+                {"sql": s.sql, "ms": s.ms, "route": s.route, "at": s.at.isoformat()} for s in reversed(self.slow)
+            ],
+        }
+
+    def render(self) -> str:
+        """Per-route query counters in Prometheus text format (appended to /api/metrics)."""
+        lines = [
+            "# HELP http_db_queries_total SQL statements executed while handling requests.",
+            "# TYPE http_db_queries_total counter",
+        ]
+        items = sorted(self.routes.items())
+        lines += [f'http_db_queries_total{{method="{m}",route="{r}"}} {a.queries}' for (m, r), a in items]
+        lines += [
+            "# HELP http_db_seconds_total Time spent in SQL statements while handling requests.",
+            "# TYPE http_db_seconds_total counter",
+        ]
+        lines += [f'http_db_seconds_total{{method="{m}",route="{r}"}} {a.seconds:.6f}' for (m, r), a in items]
+        return "\n".join(lines) + "\n"
+
+
+query_stats = QueryStats(settings.slow_query_samples)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    # Начало хранится в контексте выполнения: у упавшего запроса after_cursor_execute не вызывается,
+    # его учитывает handle_error. Служебные запросы диалекта (context=None) не засчитываются
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is not None:
+            query_stats.record_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        started = getattr(exception_context.execution_context, "query_started", None)
+        if started is not None:
+            query_stats.record_query(exception_context.statement, time.perf_counter() - started)
+
+
+class QueryStatsMiddleware:
+    """Counts queries of each HTTP request and reports them in ``Server-Timing``."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestQueries()
+        token = current_queries.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"'
+                message["headers"] = [*message.get("headers", ()), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_queries.reset(token)
+            query_stats.record_request(scope["method"], route_label(scope), stats)
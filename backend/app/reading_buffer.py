@@ -0,0 +1,119 @@
+"""Write-behind buffer for tarot reading analytics.
+
+``draw_tarot_cards`` only appends a row to memory; a background task writes
+the collected rows with one multi-row insert every ``flush_rows`` rows or
+``flush_interval_ms`` milliseconds, whichever comes first. The buffer is
+bounded: when full, new readings are dropped and counted. Remaining rows are
+flushed on shutdown. Each write also updates the analytics rollups in the
+same transaction (``app/tarot_stats.py``).
+"""
+import asyncio
+from datetime import datetime
+
+from app.config import settings
+from app.query_stats import untracked
+from app.tarot_stats import write_readings
+
+
+class ReadingBuffer:
+    def __init__(self, max_rows: int, flush_rows: int, flush_interval_ms: int) -> None:
+        self.max_rows = max_rows
+        self.flush_rows = max(flush_rows, 1)
+        self.flush_interval = flush_interval_ms / 1000
+        self._rows: list[dict] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        # Может стартовать из запроса (add) — запись буфера не засчитывается этому запросу
+        self._task = asyncio.create_task(untracked(self._run()))
+
+    async def stop(self) -> None:
+        """Let the writer finish its current flush (no cancel mid-write), then flush the rest."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def add(self, question_text: str | None, past: str, present: str, future: str) -> None:
+        if not self.running:
+            self.start()
+        if len(self._rows) >= self.max_rows:
+            self.dropped += 1
+            return
+        self._rows.append(
+            {
+                "question_text": question_text,
+                "past_card_uuid": past,
+                "present_card_uuid": present,
+                "future_card_uuid": future,
+                "created_at": datetime.utcnow(),
+            }
+        )
+        if len(self._rows) >= self.flush_rows:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write buffered rows now. Returns the number of rows written."""
+        async with self._flush_lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                await write_readings(rows)
+            except Exception as e:
+                self.failed_flushes += 1
+                # Вернуть строки в начало буфера, сколько поместится; остальное — потеряно
+                keep = rows[: max(self.max_rows - len(self._rows), 0)]
+                self.dropped += len(rows) - len(keep)
+                self._rows = keep + self._rows
+                print(f"[READING BUFFER] Flush of {len(rows)} rows failed: {e!r}")
+                return 0
+            self.flushes += 1
+            self.written += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pending": len(self._rows),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                return
+            self._wakeup.clear()
+            await self.flush()
+
+
+reading_buffer = ReadingBuffer(
+    max_rows=settings.reading_buffer_max_rows,
+    flush_rows=settings.reading_buffer_flush_rows,
+    flush_interval_ms=settings.reading_buffer_flush_interval_ms,
+)
@@ -0,0 +1,130 @@
+"""Pre-serialized JSON bodies of hot public GETs, with precompressed variants.
+
+Тело ответа кодируется в JSON и сжимается (gzip, brotli) один раз на версию
+данных (``app/table_versions.py``); запросы отдают готовые байты нужной
+кодировки по ``Accept-Encoding`` как сырой ``Response``, без Pydantic и
+``json.dumps``. ETag и Last-Modified берутся из версии, под которой тело
+было собрано.
+"""
+import asyncio
+import gzip
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from email.utils import formatdate
+
+from fastapi import Request, Response
+
+from app.conditional import CACHE_CONTROL, validators
+from app.table_versions import table_versions
+
+try:
+    import brotli
+except ImportError:  # без пакета Brotli отдаём только gzip
+    brotli = None
+
+# Меньшие тела не сжимаем: заголовки и словарь дороже выигрыша
+MIN_COMPRESS_BYTES = 512
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    versions: tuple[int, ...]
+    etag: str
+    last_modified: str
+    # content-coding -> тело; "identity" есть всегда
+    bodies: dict[str, bytes]
+
+
+def _compress(body: bytes) -> dict[str, bytes]:
+    bodies = {"identity": body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return bodies
+    # Сжатие выполняется раз на версию данных — берём максимальный уровень
+    candidates = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        candidates["br"] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+    bodies.update({coding: data for coding, data in candidates.items() if len(data) < len(body)})
+    return bodies
+
+
+def choose_encoding(accept_encoding: str | None, available) -> str:
+    """Best content-coding from ``Accept-Encoding`` among ``available`` (br > gzip > identity)."""
+    if not accept_encoding:
+        return "identity"
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+class ResponseCache:
+    def __init__(self) -> None:
+        self._entries: dict[str, EncodedBody] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, tables: tuple[str, ...], build: Callable[[], Awaitable[bytes]]) -> EncodedBody:
+        """Encoded body for ``key`` at the current versions of ``tables``; ``build()`` returns JSON bytes."""
+        versions = tuple(table_versions.version(t) for t in tables)
+        entry = self._entries.get(key)
+        if entry is not None and entry.versions == versions:
+            self.hits += 1
+            return entry
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            versions = tuple(table_versions.version(t) for t in tables)
+            if entry is not None and entry.versions == versions:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            # Версии читаются до загрузки: изменение во время сборки даст новую версию и пересборку
+            etag, modified_at = validators(tables)
+            body = await build()
+            entry = EncodedBody(
+                versions=versions,
+                etag=etag,
+                last_modified=formatdate(modified_at, usegmt=True),
+                bodies=await asyncio.to_thread(_compress, body),
+            )
+            self._entries[key] = entry
+            return entry
+
+    async def respond(
+        self, request: Request, key: str, tables: tuple[str, ...], build: Callable[[], Awaitable[bytes]]
+    ) -> Response:
+        entry = await self.get(key, tables, build)
+        coding = choose_encoding(request.headers.get("accept-encoding"), entry.bodies)
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(entry.bodies[coding], media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": {
+                key: {coding: len(body) for coding, body in entry.bodies.items()}
+                for key, entry in self._entries.items()
+            },
+        }
+
+
+response_cache = ResponseCache()
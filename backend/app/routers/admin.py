@@ -1,13 +1,22 @@
+import io
+import json
 import uuid as uuid_lib
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Header
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models import Girl, Game, TarotCard, HoroscopePrediction
+from app.models import Girl, AccessCode, Game, TarotCard, HoroscopePrediction
 from app.schemas import (
+    AccessCodeDispatchIn,
+    AdminLoginIn,
+    AdminTokenOut,
     GirlOut,
     GirlCreate,
     GirlUpdate,
@@ -17,20 +26,54 @@ from app.schemas import (
     HoroscopePredictionAdminOut,
     HoroscopePredictionCreate,
     HoroscopePredictionUpdate,
+    ProfileStartIn,
 )
-from app.auth import verify_admin_password
+from app.auth import (
+    check_admin_password,
+    create_admin_token,
+    generate_access_code,
+    girl_cache,
+    security,
+    token_cache,
+    verify_admin_token,
+)
+from app.code_dispatch import Recipient, dispatch_codes
+from app.config import settings
+from app.girls_import import FORMATS, detect_format, import_girls
+from app.image_variants import generate_in_background
+from app.profiler import profiler
+from app.query_stats import query_stats
+from app.reading_buffer import reading_buffer
+from app.response_cache import response_cache
+from app.table_versions import GIRLS, HOROSCOPE_PREDICTIONS, IMAGE_VARIANTS, TAROT_CARDS, table_versions
+from app.tarot_stats import tarot_stats
+from app.uploads import UPLOADS_URL, UploadTooLarge, save_upload
+from app.email_queue import email_queue
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
-UPLOADS_DIR = Path(__file__).resolve().parent.parent.parent / "static" / "uploads"
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 MB
 
 
-async def require_admin(x_admin_password: str | None = Header(None, alias="X-Admin-Password")):
-    if not x_admin_password or not verify_admin_password(x_admin_password):
+async def require_admin(
+    x_admin_password: str | None = Header(None, alias="X-Admin-Password"),
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+):
+    """Admin token from POST /login (Authorization: Bearer) or, as before, X-Admin-Password."""
+    if credentials and verify_admin_token(credentials.credentials):
+        return True
+    if x_admin_password and await check_admin_password(x_admin_password):
+        return True
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+
+
+@router.post("/login", response_model=AdminTokenOut)
+async def admin_login(data: AdminLoginIn):
+    """Check the admin password once and issue a short-lived admin token."""
+    if not await check_admin_password(data.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
-    return True
+    return AdminTokenOut(access_token=create_admin_token(), expires_in=settings.admin_token_ttl_minutes * 60)
 
 
 @router.post("/upload")
@@ -38,23 +81,87 @@ async def admin_upload_image(
     file: UploadFile = File(...),
     _: bool = Depends(require_admin),
 ):
-    """Upload an image for tarot card. Returns public URL path (e.g. /girls/static/uploads/xxx.jpg)."""
+    """Upload an image for tarot card. Returns public URL path (e.g. /girls/static/uploads/ab/ab12...ef.jpg).
+
+    The name is the sha256 of the content, so re-uploading the same image returns the same URL.
+    """
     suffix = Path(file.filename or "").suffix.lower()
     if suffix not in ALLOWED_IMAGE_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Разрешены только изображения: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}",
         )
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_BYTES:
+    try:
+        name, sha256, created = await save_upload(file, suffix, MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Файл слишком большой (макс. 5 МБ)",
         )
-    name = f"{uuid_lib.uuid4().hex}{suffix}"
-    path = UPLOADS_DIR / name
-    path.write_bytes(content)
-    return {"url": f"/girls/static/uploads/{name}"}
+    # Уменьшенные копии считаются в фоне; каталог перечитается, когда они будут готовы.
+    # У уже сохранённого файла они есть
+    if created:
+        generate_in_background(name, on_done=partial(table_versions.bump, IMAGE_VARIANTS))
+    return {"url": f"{UPLOADS_URL}/{name}", "sha256": sha256, "deduplicated": not created}
+
+
+@router.get("/email-queue")
+async def admin_email_queue_stats(_: bool = Depends(require_admin)):
+    """Depth, delivery latency and dead letters of the background email queue."""
+    return email_queue.stats()
+
+
+@router.get("/reading-buffer")
+async def admin_reading_buffer_stats(_: bool = Depends(require_admin)):
+    """Pending, written and dropped tarot readings of the write-behind buffer."""
+    return reading_buffer.stats()
+
+
+@router.get("/auth-cache")
+async def admin_auth_cache_stats(_: bool = Depends(require_admin)):
+    """Hit/miss counters of the token and girl caches used by authenticated endpoints."""
+    return {"tokens": token_cache.stats(), "girls": girl_cache.stats()}
+
+
+@router.get("/response-cache")
+async def admin_response_cache_stats(_: bool = Depends(require_admin)):
+    """Hit/miss counters and per-encoding body sizes of the public response cache."""
+    return response_cache.stats()
+
+
+@router.get("/query-stats")
+async def admin_query_stats(_: bool = Depends(require_admin)):
+    """SQL statements and DB time per route, plus recent slow statements (normalized)."""
+    return query_stats.stats()
+
+
+@router.post("/profile")
+async def admin_start_profile(data: ProfileStartIn, _: bool = Depends(require_admin)):
+    """Sample a share of requests to the given routes for a bounded window (collapsed stacks)."""
+    if profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Profiling session already running")
+    try:
+        profiler.start(data.routes, data.sample_rate, data.duration_seconds, data.interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return profiler.status()
+
+
+@router.get("/profile")
+async def admin_profile_status(_: bool = Depends(require_admin)):
+    return profiler.status()
+
+
+@router.get("/profile/collapsed", response_class=PlainTextResponse)
+async def admin_profile_collapsed(_: bool = Depends(require_admin)):
+    """Stacks of the current or last session: ``route;frame;...;frame count`` per line (flamegraph.pl, speedscope)."""
+    return profiler.collapsed()
+
+
+@router.delete("/profile")
+async def admin_stop_profile(_: bool = Depends(require_admin)):
+    profiler.stop()
+    return profiler.status()
 
 
 @router.get("/girls", response_model=list[GirlOut])
@@ -76,9 +183,40 @@ async def admin_create_girl(
     db.add(girl)
     await db.flush()
     await db.refresh(girl)
+    await db.commit()
+    table_versions.bump(GIRLS)
     return GirlOut.model_validate(girl)
 
 
+@router.post("/girls/import")
+async def admin_import_girls(
+    file: UploadFile = File(...),
+    fmt: str | None = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(require_admin),
+):
+    """Upsert girls by email from a CSV (name,email,gift_certificate_url) or NDJSON upload.
+
+    A non-UTF-8 file gives 400 if nothing was imported; otherwise the report with ``stopped``.
+    """
+    fmt = fmt or detect_format(file.filename)
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Формат файла: .csv или .ndjson (или параметр format)",
+        )
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = await import_girls(db, lines, fmt)
+    finally:
+        lines.detach()
+        # Импорт мог обновить уже закешированных девушек (кеш авторизации подписан на GIRLS)
+        table_versions.bump(GIRLS)
+    if report.stopped and not report.processed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Файл должен быть в UTF-8")
+    return report.as_dict()
+
+
 @router.patch("/girls/{girl_id}", response_model=GirlOut)
 async def admin_update_girl(
     girl_id: int,
@@ -99,6 +237,8 @@ async def admin_update_girl(
         girl.gift_certificate_url = update_data["gift_certificate_url"] or None
     await db.flush()
     await db.refresh(girl)
+    await db.commit()
+    table_versions.bump(GIRLS)
     return GirlOut.model_validate(girl)
 
 
@@ -113,9 +253,54 @@ async def admin_delete_girl(
     if not girl:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     await db.delete(girl)
+    await db.commit()
+    table_versions.bump(GIRLS)
     return {"ok": True}
 
 
+@router.post("/access-codes/dispatch")
+async def admin_dispatch_access_codes(
+    data: AccessCodeDispatchIn,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(require_admin),
+):
+    """Create codes for active girls in one transaction and email them concurrently.
+
+    Response is NDJSON: a line per recipient as soon as its email is sent or fails,
+    then a summary line ``{"done": true, ...}``.
+    """
+    query = select(Girl).where(Girl.is_active).order_by(Girl.id)
+    if data.girl_ids is not None:
+        query = query.where(Girl.id.in_(data.girl_ids))
+    girls = (await db.execute(query)).scalars().all()
+    expires_at = datetime.utcnow() + timedelta(hours=settings.code_expire_hours)
+    recipients = [
+        Recipient(girl_id=g.id, email=g.email, name=g.name, code=generate_access_code()) for g in girls
+    ]
+    if recipients:
+        await db.execute(
+            insert(AccessCode),
+            [{"girl_id": r.girl_id, "code": r.code, "expires_at": expires_at} for r in recipients],
+        )
+    await db.commit()
+
+    concurrency = data.concurrency or settings.dispatch_concurrency
+    rate = data.rate_per_second if data.rate_per_second is not None else settings.dispatch_rate_per_second
+
+    async def progress():
+        yield json.dumps({"total": len(recipients)}) + "\n"
+        sent = failed = 0
+        async for item in dispatch_codes(recipients, concurrency, rate):
+            if item["status"] == "sent":
+                sent += 1
+            else:
+                failed += 1
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "sent": sent, "failed": failed}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
 @router.get("/games", response_model=list[dict])
 async def admin_list_games(
     db: AsyncSession = Depends(get_db),
@@ -153,6 +338,8 @@ async def admin_create_tarot_card(
     db.add(card)
     await db.flush()
     await db.refresh(card)
+    await db.commit()
+    table_versions.bump(TAROT_CARDS)
     return TarotCardAdminOut.model_validate(card)
 
 
@@ -174,6 +361,8 @@ async def admin_update_tarot_card(
         card.image_url = None
     await db.flush()
     await db.refresh(card)
+    await db.commit()
+    table_versions.bump(TAROT_CARDS)
     return TarotCardAdminOut.model_validate(card)
 
 
@@ -188,9 +377,29 @@ async def admin_delete_tarot_card(
     if not card:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
     await db.delete(card)
+    await db.commit()
+    table_versions.bump(TAROT_CARDS)
     return {"ok": True}
 
 
+@router.get("/tarot-stats")
+async def admin_tarot_stats(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(require_admin),
+):
+    """Most drawn cards per position and readings per hour (UTC). Optional range: [since, until), whole hours."""
+    return await tarot_stats(db, _naive_utc(since), _naive_utc(until))
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    """Columns store naive UTC: convert ``...Z`` / ``+03:00`` instead of dropping the offset."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 # Horoscope predictions admin
 @router.get("/horoscope-predictions", response_model=list[HoroscopePredictionAdminOut])
 async def admin_list_horoscope_predictions(
@@ -218,6 +427,8 @@ async def admin_create_horoscope_prediction(
     db.add(pred)
     await db.flush()
     await db.refresh(pred)
+    await db.commit()
+    table_versions.bump(HOROSCOPE_PREDICTIONS)
     return HoroscopePredictionAdminOut.model_validate(pred)
 
 
@@ -237,6 +448,8 @@ async def admin_update_horoscope_prediction(
         setattr(pred, key, value)
     await db.flush()
     await db.refresh(pred)
+    await db.commit()
+    table_versions.bump(HOROSCOPE_PREDICTIONS)
     return HoroscopePredictionAdminOut.model_validate(pred)
 
 
@@ -251,4 +464,6 @@ async def admin_delete_horoscope_prediction(
     if not pred:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prediction not found")
     await db.delete(pred)
+    await db.commit()
+    table_versions.bump(HOROSCOPE_PREDICTIONS)
     return {"ok": True}
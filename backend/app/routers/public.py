@@ -2,12 +2,13 @@ from datetime import datetime, timedelta
 import random
 import secrets
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models import Girl, AccessCode, Game, TarotCard, TarotReading, HoroscopePrediction
+from app.models import Girl, AccessCode
 from app.schemas import (
     GirlOut,
     GameOut,
@@ -22,19 +23,38 @@ from app.schemas import (
     HoroscopeSignOut,
     HoroscopePredictionOut,
     HoroscopePredictionRequest,
+    HoroscopeBatchRequest,
+    HoroscopeBatchItemOut,
+    HoroscopeBatchOut,
 )
-from app.auth import create_access_token, require_girl
-from app.email import send_code_email
+from app.auth import create_access_token, generate_access_code, require_girl
+from app.catalog import catalog
+from app.conditional import not_modified
+from app.email_queue import email_queue
 from app.config import settings
-from app.horoscope_data import ROLES, SIGNS, EASTER_EGG_PHRASES
+from app.horoscope import PREFIXES, horoscope_engine
+from app.horoscope_data import ROLES, SIGNS
+from app.reading_buffer import reading_buffer
+from app.response_cache import response_cache
+from app.table_versions import GAMES, GIRLS, HOROSCOPE_DATA, IMAGE_VARIANTS, TAROT_CARDS
 
 router = APIRouter(prefix="/api", tags=["public"])
 
+# Списки сериализуются в байты один раз на версию данных (app/response_cache.py)
+_GIRLS_JSON = TypeAdapter(list[GirlOut])
+_GAMES_JSON = TypeAdapter(list[GameOut])
+_TAROT_CARDS_JSON = TypeAdapter(list[TarotCardOut])
+_ROLES_JSON = TypeAdapter(list[HoroscopeRoleOut])
+_SIGNS_JSON = TypeAdapter(list[HoroscopeSignOut])
 
-@router.get("/girls", response_model=list[GirlOut])
-async def list_girls(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Girl).where(Girl.is_active).order_by(Girl.name))
-    return [GirlOut.model_validate(g) for g in result.scalars().all()]
+
+@router.get("/girls", response_model=list[GirlOut], dependencies=[not_modified(GIRLS)])
+async def list_girls(request: Request, db: AsyncSession = Depends(get_db)):
+    async def build() -> bytes:
+        result = await db.execute(select(Girl).where(Girl.is_active).order_by(Girl.name))
+        return _GIRLS_JSON.dump_json([GirlOut.model_validate(g) for g in result.scalars().all()])
+
+    return await response_cache.respond(request, "girls", (GIRLS,), build)
 
 
 @router.post("/auth/request-code")
@@ -43,12 +63,20 @@ async def request_code(data: RequestCodeIn, db: AsyncSession = Depends(get_db)):
     girl = result.scalar_one_or_none()
     if not girl:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Girl not found")
-    code = secrets.token_hex(4).upper()[:8]
+    code = generate_access_code()
     expires_at = datetime.utcnow() + timedelta(hours=settings.code_expire_hours)
     access = AccessCode(girl_id=girl.id, code=code, expires_at=expires_at)
     db.add(access)
     await db.flush()
-    await send_code_email(girl.email, code, girl.name)
+    # Письмо уходит в фоне: ответ не ждёт почтового провайдера. В очередь — до коммита:
+    # если она полна, код откатывается, а не остаётся в базе неотправленным
+    if not email_queue.enqueue(girl.email, code, girl.name):
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Email queue is full, try again later",
+        )
+    await db.commit()
     return {"message": "Code sent to email"}
 
 
@@ -70,61 +98,51 @@ async def verify_code(data: VerifyCodeIn, db: AsyncSession = Depends(get_db)):
     return TokenOut(access_token=token, girl_id=access.girl_id)
 
 
-@router.get("/games", response_model=list[GameOut])
-async def list_games(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Game).where(Game.is_active).order_by(Game.sort_order, Game.id))
-    return [GameOut.model_validate(g) for g in result.scalars().all()]
+@router.get("/games", response_model=list[GameOut], dependencies=[not_modified(GAMES)])
+async def list_games(request: Request, db: AsyncSession = Depends(get_db)):
+    async def build() -> bytes:
+        return _GAMES_JSON.dump_json(list((await catalog.get(db)).games))
+
+    return await response_cache.respond(request, "games", (GAMES,), build)
 
 
 @router.get("/games/{slug}")
 async def game_stub(slug: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Game).where(Game.slug == slug, Game.is_active))
-    game = result.scalar_one_or_none()
+    snapshot = await catalog.get(db)
+    game = snapshot.games_by_slug.get(slug)
     if not game:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game not found")
     return {"slug": game.slug, "title": game.title, "stub": True}
 
 
-@router.get("/tarot-cards", response_model=list[TarotCardOut])
-async def list_tarot_cards(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(TarotCard).where(TarotCard.is_active).order_by(TarotCard.sort_order, TarotCard.id)
-    )
-    return [TarotCardOut.model_validate(c) for c in result.scalars().all()]
+@router.get(
+    "/tarot-cards", response_model=list[TarotCardOut], dependencies=[not_modified(TAROT_CARDS, IMAGE_VARIANTS)]
+)
+async def list_tarot_cards(request: Request, db: AsyncSession = Depends(get_db)):
+    async def build() -> bytes:
+        return _TAROT_CARDS_JSON.dump_json(list((await catalog.get(db)).tarot_cards))
+
+    return await response_cache.respond(request, "tarot_cards", (TAROT_CARDS, IMAGE_VARIANTS), build)
 
 
 @router.post("/tarot-cards/draw", response_model=TarotDrawOut)
 async def draw_tarot_cards(data: TarotDrawIn, db: AsyncSession = Depends(get_db)):
-    import random
     count = min(max(data.count, 1), 10)
-    result = await db.execute(
-        select(TarotCard).where(TarotCard.is_active).order_by(TarotCard.sort_order, TarotCard.id)
-    )
-    cards = list(result.scalars().all())
+    snapshot = await catalog.get(db)
+    cards = snapshot.tarot_cards
     if len(cards) < count:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Not enough cards in deck (need {count}, have {len(cards)})",
         )
     drawn = random.sample(cards, count)
-    # Log reading for analytics
-    reading = TarotReading(
-        question_text=(data.question or "").strip() or None,
-        past_card_uuid=drawn[0].uuid,
-        present_card_uuid=drawn[1].uuid if len(drawn) > 1 else drawn[0].uuid,
-        future_card_uuid=drawn[2].uuid if len(drawn) > 2 else drawn[0].uuid,
-    )
-    db.add(reading)
-    await db.flush()
     # Return exactly 3 for past/present/future
     past = drawn[0]
     present = drawn[1] if len(drawn) > 1 else drawn[0]
     future = drawn[2] if len(drawn) > 2 else drawn[0]
-    return TarotDrawOut(
-        past=TarotCardOut.model_validate(past),
-        present=TarotCardOut.model_validate(present),
-        future=TarotCardOut.model_validate(future),
-    )
+    # Log reading for analytics (written in batches by the background buffer)
+    reading_buffer.add((data.question or "").strip() or None, past.uuid, present.uuid, future.uuid)
+    return TarotDrawOut(past=past, present=present, future=future)
 
 
 @router.post("/certificate", response_model=CertificateOut)
@@ -144,64 +162,46 @@ async def create_certificate(
 
 # --- Horoscope (8 March mini-game) ---
 
-@router.get("/horoscope/roles", response_model=list[HoroscopeRoleOut])
-async def list_horoscope_roles():
-    return [HoroscopeRoleOut.model_validate(r) for r in ROLES]
+@router.get("/horoscope/roles", response_model=list[HoroscopeRoleOut], dependencies=[not_modified(HOROSCOPE_DATA)])
+async def list_horoscope_roles(request: Request):
+    async def build() -> bytes:
+        return _ROLES_JSON.dump_json([HoroscopeRoleOut.model_validate(r) for r in ROLES])
 
+    return await response_cache.respond(request, "horoscope_roles", (HOROSCOPE_DATA,), build)
 
-@router.get("/horoscope/signs", response_model=list[HoroscopeSignOut])
-async def list_horoscope_signs():
-    return [HoroscopeSignOut.model_validate(s) for s in SIGNS]
 
+@router.get("/horoscope/signs", response_model=list[HoroscopeSignOut], dependencies=[not_modified(HOROSCOPE_DATA)])
+async def list_horoscope_signs(request: Request):
+    async def build() -> bytes:
+        return _SIGNS_JSON.dump_json([HoroscopeSignOut.model_validate(s) for s in SIGNS])
 
-EASTER_EGG_START = "{{EASTER}}"
-EASTER_EGG_END = "{{/EASTER}}"
+    return await response_cache.respond(request, "horoscope_signs", (HOROSCOPE_DATA,), build)
 
 
-def _insert_easter_egg(text: str) -> str:
-    """Вставляет несколько пасхалок (2–4) в текст, каждая в маркерах для стилизации на фронте."""
-    if not EASTER_EGG_PHRASES:
-        return text
-    words = text.split()
-    if len(words) < 2:
-        wrapped = f"{EASTER_EGG_START}{random.choice(EASTER_EGG_PHRASES).strip()}{EASTER_EGG_END}"
-        return text + " " + wrapped
-    n_insert = random.randint(2, 4)
-    for _ in range(n_insert):
-        phrase = random.choice(EASTER_EGG_PHRASES).strip()
-        wrapped = f"{EASTER_EGG_START}{phrase}{EASTER_EGG_END}"
-        pos = random.randint(0, len(words))
-        words.insert(pos, wrapped)
-    return " ".join(words)
-
-
-def _get_role_and_sign(role_id: str, sign_id: str) -> tuple[dict, dict]:
-    role_by_id = {r["id"]: r for r in ROLES}
-    sign_by_id = {s["id"]: s for s in SIGNS}
-    role = role_by_id.get(role_id)
-    sign = sign_by_id.get(sign_id)
-    if not role or not sign:
+def _get_prefix(role_id: str, sign_id: str) -> tuple[str, ...]:
+    prefix = PREFIXES.get((role_id, sign_id))
+    if prefix is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Unknown role_id or sign_id",
         )
-    return role, sign
+    return prefix
 
 
-async def _fetch_horoscope_text(role_id: str, sign_id: str, db: AsyncSession) -> str:
-    role, sign = _get_role_and_sign(role_id, sign_id)
-    result = await db.execute(
-        select(HoroscopePrediction).where(HoroscopePrediction.is_active).order_by(HoroscopePrediction.sort_order, HoroscopePrediction.id)
-    )
-    predictions = list(result.scalars().all())
+async def _get_predictions(db: AsyncSession) -> tuple[tuple[str, ...], ...]:
+    predictions = await horoscope_engine.predictions(db)
     if not predictions:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="No predictions in database",
         )
-    pred = random.choice(predictions)
-    sentence = f"{sign['label_rod']} {role['label_rod']} ждёт: {pred.text}"
-    return _insert_easter_egg(sentence)
+    return predictions
+
+
+async def _fetch_horoscope_text(role_id: str, sign_id: str, db: AsyncSession) -> str:
+    prefix = _get_prefix(role_id, sign_id)
+    predictions = await _get_predictions(db)
+    return horoscope_engine.render(prefix, predictions)
 
 
 @router.get("/horoscope/prediction", response_model=HoroscopePredictionOut)
@@ -221,31 +221,28 @@ async def get_horoscope_prediction_post(
 ):
     text = await _fetch_horoscope_text(body.role_id, body.sign_id, db)
     return HoroscopePredictionOut(text=text)
-    if not rid or not sid:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="role_id and sign_id are required",
-        )
-    role_by_id = {r["id"]: r for r in ROLES}
-    sign_by_id = {s["id"]: s for s in SIGNS}
-    role = role_by_id.get(rid)
-    sign = sign_by_id.get(sid)
-    if not role or not sign:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Unknown role_id or sign_id",
-        )
-    result = await db.execute(
-        select(HoroscopePrediction).where(HoroscopePrediction.is_active).order_by(HoroscopePrediction.sort_order, HoroscopePrediction.id)
+
+
+@router.post("/horoscope/predictions", response_model=HoroscopeBatchOut)
+async def get_horoscope_predictions_batch(
+    body: HoroscopeBatchRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Предсказания для нескольких пар (роль, знак) за один запрос — для предзагрузки на фронте."""
+    if body.items == "all":
+        pairs = list(PREFIXES)
+    else:
+        if len(body.items) > len(PREFIXES):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many items (max {len(PREFIXES)})",
+            )
+        pairs = [(item.role_id, item.sign_id) for item in body.items]
+    prefixes = [_get_prefix(role_id, sign_id) for role_id, sign_id in pairs]
+    predictions = await _get_predictions(db)
+    return HoroscopeBatchOut(
+        items=[
+            HoroscopeBatchItemOut(role_id=role_id, sign_id=sign_id, text=horoscope_engine.render(prefix, predictions))
+            for (role_id, sign_id), prefix in zip(pairs, prefixes)
+        ]
     )
-    predictions = list(result.scalars().all())
-    if not predictions:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="No predictions in database",
-        )
-    pred = random.choice(predictions)
-    # Итоговая фраза: «[Знак род.] [роль род.] ждёт: [текст]»
-    sentence = f"{sign['label_rod']} {role['label_rod']} ждёт: {pred.text}"
-    sentence = _insert_easter_egg(sentence)
-    return HoroscopePredictionOut(text=sentence)
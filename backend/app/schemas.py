@@ -1,4 +1,6 @@
 from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel, EmailStr
 
 
@@ -26,6 +28,21 @@ class GirlUpdate(BaseModel):
     gift_certificate_url: str | None = None
 
 
+class AccessCodeDispatchIn(BaseModel):
+    # None — всем активным девушкам
+    girl_ids: list[int] | None = None
+    concurrency: int | None = None
+    rate_per_second: float | None = None
+
+
+class ProfileStartIn(BaseModel):
+    # Шаблоны маршрутов, например "/api/tarot-cards/draw"; None — все
+    routes: list[str] | None = None
+    sample_rate: float = 0.1
+    duration_seconds: float = 60
+    interval_ms: float = 5
+
+
 class GameOut(BaseModel):
     id: int
     slug: str
@@ -52,6 +69,16 @@ class TokenOut(BaseModel):
     girl_id: int
 
 
+class AdminLoginIn(BaseModel):
+    password: str
+
+
+class AdminTokenOut(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+
 class CertificateOut(BaseModel):
     url: str
     token: str
@@ -63,6 +90,8 @@ class TarotCardOut(BaseModel):
     title: str
     description: str
     image_url: str | None = None
+    # Уменьшенные копии картинки: {"webp": "url 320w, url 640w", "jpeg": "..."}
+    image_srcset: dict[str, str] = {}
 
     class Config:
         from_attributes = True
@@ -130,6 +159,19 @@ class HoroscopePredictionRequest(BaseModel):
     sign_id: str
 
 
+class HoroscopeBatchRequest(BaseModel):
+    # Список пар (role_id, sign_id) или "all" — все комбинации ролей и знаков
+    items: list[HoroscopePredictionRequest] | Literal["all"] = "all"
+
+
+class HoroscopeBatchItemOut(HoroscopePredictionOut, HoroscopePredictionRequest):
+    pass
+
+
+class HoroscopeBatchOut(BaseModel):
+    items: list[HoroscopeBatchItemOut]
+
+
 class HoroscopePredictionCreate(BaseModel):
     text: str
     sort_order: int = 0
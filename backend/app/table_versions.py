@@ -0,0 +1,206 @@
+"""Per-table change versions that drive cache invalidation and HTTP validators.
+
+Админские мутации после коммита вызывают ``table_versions.bump("girls")`` и т.п.,
+скрипты из ``scripts/`` (импорт, сиды, картинки) — ``bump_shared(...)``.
+Кеши (каталог, гороскоп, девушки для авторизации) подписываются на свои
+таблицы и сбрасываются при ``bump``; публичные эндпоинты строят из версий ETag
+и Last-Modified (``app/conditional.py``).
+
+Версии общие для всех воркеров uvicorn: после ``share(path)`` (lifespan) они
+лежат в небольшом файле, отображённом в память. ``bump`` меняет слоты таблиц
+и общий счётчик поколений под ``lockf``; каждый воркер в начале запроса
+(``TableVersionsMiddleware``) читает этот счётчик — 8 байт — и, только если он
+изменился, подхватывает новые версии и сбрасывает свои подписанные кеши. Файл
+создаётся заново (с новой эпохой для ETag), когда его не держит ни один живой
+процесс, — после рестарта ETag отличаются от выданных раньше.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import secrets
+import stat
+import struct
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+
+from sqlalchemy.engine import make_url
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+GIRLS = "girls"
+GAMES = "games"
+TAROT_CARDS = "tarot_cards"
+IMAGE_VARIANTS = "image_variants"
+HOROSCOPE_PREDICTIONS = "horoscope_predictions"
+# Роли и знаки гороскопа — константы в коде, меняются только с деплоем
+HOROSCOPE_DATA = "horoscope_data"
+
+# Порядок задаёт слоты в общем файле
+TABLES = (GIRLS, GAMES, TAROT_CARDS, IMAGE_VARIANTS, HOROSCOPE_PREDICTIONS, HOROSCOPE_DATA)
+
+# Заголовок: поколение (растёт при каждом bump), эпоха, время создания файла
+_HEADER = struct.Struct("<QQd")
+_GENERATION = struct.Struct("<Q")
+# Слот таблицы: версия, время последнего bump
+_SLOT = struct.Struct("<Qd")
+_SIZE = _HEADER.size + _SLOT.size * len(TABLES)
+
+
+def shared_file_path() -> str:
+    """``TABLE_VERSIONS_FILE`` or a file named after the database in a private per-user directory."""
+    if settings.table_versions_file:
+        return settings.table_versions_file
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        # ./girls.db у двух чекаутов на одном хосте — разные базы, значит и разные файлы версий
+        url = url.set(database=os.path.abspath(url.database))
+    digest = hashlib.sha256(url.render_as_string(hide_password=False).encode()).hexdigest()[:12]
+    return os.path.join(_private_dir(), f"table-versions-{digest}")
+
+
+def _private_dir() -> str:
+    """``<tmp>/girls-<uid>`` with mode 0700: other local users cannot pre-create or swap the file."""
+    path = os.path.join(tempfile.gettempdir(), f"girls-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be a directory owned by this user with mode 0700 (or set TABLE_VERSIONS_FILE)")
+    return path
+
+
+class TableVersions:
+    def __init__(self) -> None:
+        # До share() версии живут в памяти процесса (скрипты, тесты)
+        self.epoch = secrets.token_hex(4)
+        self._created_at = time.time()
+        self._versions: dict[str, int] = {}
+        self._modified_at: dict[str, float] = {}
+        self._listeners: dict[str, list[Callable[[], None]]] = {}
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._generation = 0
+
+    def share(self, path: str) -> None:
+        """Keep versions in the file at ``path``, shared by every process that opens it."""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Файл держат живые воркеры; ждём, пока первый из них его заполнит
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        else:
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, _SIZE)
+            os.pwrite(fd, _HEADER.pack(0, secrets.randbits(32), time.time()), 0)
+            # Разделяемая блокировка держится до выхода: по ней следующий процесс видит живых соседей
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        self._fd = fd
+        self._map = mmap.mmap(fd, _SIZE)
+        _, epoch, self._created_at = _HEADER.unpack_from(self._map, 0)
+        self.epoch = f"{epoch:08x}"
+        self._generation = -1
+        self.sync()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = self._fd = None
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def modified_at(self, table: str) -> float:
+        """Unix time of the last bump (creation of the shared file if never bumped)."""
+        return self._modified_at.get(table, self._created_at)
+
+    def subscribe(self, tables: Iterable[str], callback: Callable[[], None]) -> None:
+        """Call ``callback()`` whenever any of ``tables`` is bumped, in this or another worker."""
+        for table in tables:
+            self._listeners.setdefault(table, []).append(callback)
+
+    def bump(self, *tables: str) -> None:
+        """Mark tables as changed. Call after the admin transaction is committed."""
+        now = time.time()
+        if self._map is None:
+            for table in tables:
+                self._versions[table] = self.version(table) + 1
+                self._modified_at[table] = now
+        else:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for table in tables:
+                    offset = _HEADER.size + TABLES.index(table) * _SLOT.size
+                    version = _SLOT.unpack_from(self._map, offset)[0] + 1
+                    _SLOT.pack_into(self._map, offset, version, now)
+                    self._versions[table] = version
+                    self._modified_at[table] = now
+                # Поколение пишется после слотов: кто увидел новое поколение, увидит и версии.
+                # Своё поколение не запоминаем — sync() подхватит и чужие bump'ы до нашего
+                _GENERATION.pack_into(self._map, 0, _GENERATION.unpack_from(self._map, 0)[0] + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._notify(tables)
+
+    def sync(self) -> None:
+        """Pick up bumps made by other workers; a single 8-byte read when nothing changed."""
+        if self._map is None:
+            return
+        generation = _GENERATION.unpack_from(self._map, 0)[0]
+        if generation == self._generation:
+            return
+        self._generation = generation
+        changed = []
+        for i, table in enumerate(TABLES):
+            version, modified_at = _SLOT.unpack_from(self._map, _HEADER.size + i * _SLOT.size)
+            if version != self.version(table):
+                self._versions[table] = version
+                self._modified_at[table] = modified_at
+                changed.append(table)
+        self._notify(changed)
+
+    def _notify(self, tables: Iterable[str]) -> None:
+        callbacks: list[Callable[[], None]] = []
+        for table in tables:
+            for callback in self._listeners.get(table, ()):
+                if callback not in callbacks:
+                    callbacks.append(callback)
+        for callback in callbacks:
+            callback()
+
+    def snapshot(self) -> dict[str, int]:
+        return dict(self._versions)
+
+
+table_versions = TableVersions()
+
+
+def bump_shared(*tables: str) -> None:
+    """For CLI scripts writing outside the server: bump ``tables`` in the shared file so workers drop their caches."""
+    try:
+        table_versions.share(shared_file_path())
+    except FileNotFoundError:
+        # Нет каталога (RuntimeDirectory создаётся при старте сервиса) — API не запущен, сбрасывать нечего
+        return
+    try:
+        table_versions.bump(*tables)
+    finally:
+        table_versions.close()
+
+
+class TableVersionsMiddleware:
+    """Syncs shared table versions before each HTTP request, so caches never serve another worker's stale data."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            table_versions.sync()
+        await self.app(scope, receive, send)
@@ -0,0 +1,215 @@
+"""Incremental rollups of tarot readings and the stats built on them.
+
+Счётчики (карта × позиция, раскладов в час) обновляются по водяному знаку —
+id последнего учтённого ``TarotReading``. Буфер раскладов вставляет строки и
+учитывает их в одной транзакции (``insert_readings``), исторические строки
+учитывает фоновый догон при старте (или ``scripts/rollup_tarot_readings.py``).
+Обновление счётчиков и водяного знака — одна транзакция, поэтому строка не
+учитывается дважды.
+
+Обе транзакции начинаются с блокировки строки состояния (``FOR UPDATE``), и
+вставка раскладов идёт уже под ней: при нескольких воркерах на PostgreSQL id
+фиксируются по порядку, и водяной знак не перепрыгивает через строки, которые
+другой воркер ещё не закоммитил.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session, upsert_insert
+from app.models import TarotCard, TarotCardCounter, TarotHourlyCounter, TarotReading, TarotRollupState
+
+POSITIONS = ("past", "present", "future")
+ROLLUP_BATCH = 5000
+# Почасовой ряд без since — только последние 7 дней до until (или до текущего часа)
+HOURLY_WINDOW = timedelta(days=7)
+
+_update_lock = asyncio.Lock()
+
+
+async def _lock_state(session: AsyncSession) -> TarotRollupState:
+    """Lock the watermark row; readings inserts and rollups of all workers take turns on it."""
+    query = select(TarotRollupState).where(TarotRollupState.id == 1).with_for_update()
+    state = (await session.execute(query)).scalar_one_or_none()
+    if state is None:
+        # Строку создаёт миграция 005; для баз, мигрированных раньше, — без гонки между воркерами
+        stmt = upsert_insert(session.bind)(TarotRollupState).values(id=1, last_reading_id=0)
+        await session.execute(stmt.on_conflict_do_nothing(index_elements=[TarotRollupState.id]))
+        state = (await session.execute(query)).scalar_one()
+    return state
+
+
+async def apply_new_readings(session: AsyncSession, limit: int = ROLLUP_BATCH) -> int:
+    """Count up to ``limit`` readings past the watermark and commit. Returns rows processed."""
+    state = await _lock_state(session)
+    n = await _count_readings(session, state, limit)
+    await session.commit()
+    return n
+
+
+async def insert_readings(session: AsyncSession, rows: list[dict]) -> None:
+    """Insert readings and count them (with any backlog) in one transaction, then commit."""
+    state = await _lock_state(session)
+    await session.execute(insert(TarotReading), rows)
+    while await _count_readings(session, state, ROLLUP_BATCH) == ROLLUP_BATCH:
+        pass
+    await session.commit()
+
+
+async def _count_readings(session: AsyncSession, state: TarotRollupState, limit: int) -> int:
+    """Add up to ``limit`` readings past the watermark to the counters and move it; no commit."""
+    rows = (
+        await session.execute(
+            select(
+                TarotReading.id,
+                TarotReading.past_card_uuid,
+                TarotReading.present_card_uuid,
+                TarotReading.future_card_uuid,
+                TarotReading.created_at,
+            )
+            .where(TarotReading.id > state.last_reading_id)
+            .order_by(TarotReading.id)
+            .limit(limit)
+        )
+    ).all()
+    if not rows:
+        return 0
+
+    cards: Counter[tuple[str, str]] = Counter()
+    hours: Counter[datetime] = Counter()
+    for _, past, present, future, created_at in rows:
+        cards[(past, "past")] += 1
+        cards[(present, "present")] += 1
+        cards[(future, "future")] += 1
+        if created_at is not None:
+            hours[created_at.replace(minute=0, second=0, microsecond=0)] += 1
+
+    insert = upsert_insert(session.bind)
+    stmt = insert(TarotCardCounter)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TarotCardCounter.card_uuid, TarotCardCounter.position],
+            set_={"count": TarotCardCounter.count + stmt.excluded.count},
+        ),
+        [{"card_uuid": uuid, "position": pos, "count": n} for (uuid, pos), n in cards.items()],
+    )
+    if hours:
+        stmt = insert(TarotHourlyCounter)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TarotHourlyCounter.hour],
+                set_={"count": TarotHourlyCounter.count + stmt.excluded.count},
+            ),
+            [{"hour": hour, "count": n} for hour, n in hours.items()],
+        )
+    state.last_reading_id = rows[-1][0]
+    await session.flush()
+    return len(rows)
+
+
+async def write_readings(rows: list[dict]) -> None:
+    """``insert_readings`` in its own session; serialized with rollups within the process."""
+    async with _update_lock:
+        async with async_session() as session:
+            await insert_readings(session, rows)
+
+
+async def update_rollups(batch: int = ROLLUP_BATCH) -> int:
+    """Apply one batch in its own session; serialized within the process."""
+    async with _update_lock:
+        async with async_session() as session:
+            return await apply_new_readings(session, batch)
+
+
+async def catch_up(batch: int = ROLLUP_BATCH) -> int:
+    """Process all readings past the watermark in batches (one transaction each)."""
+    total = 0
+    while True:
+        n = await update_rollups(batch)
+        total += n
+        if n < batch:
+            return total
+
+
+async def tarot_stats(session: AsyncSession, since: datetime | None = None, until: datetime | None = None) -> dict:
+    """Per-card/per-position counts and readings per hour.
+
+    ``since``/``until`` are naive UTC and hour-aligned: ``since`` is rounded down,
+    ``until`` up to a whole hour, and both halves of the response use these bounds.
+    Without a time range the card counts come from the rollups (O(cards)); with a
+    range they are aggregated from readings via the ``created_at`` index. Without
+    ``since`` the hourly series covers ``HOURLY_WINDOW`` before ``until`` (or now).
+    """
+    if since is not None:
+        since = _floor_hour(since)
+    if until is not None:
+        until = _ceil_hour(until)
+    titles = dict((await session.execute(select(TarotCard.uuid, TarotCard.title))).all())
+    if since is None and until is None:
+        card_rows = (
+            await session.execute(select(TarotCardCounter.card_uuid, TarotCardCounter.position, TarotCardCounter.count))
+        ).all()
+    else:
+        card_rows = (await session.execute(_ranged_card_counts(since, until))).all()
+
+    by_card: dict[str, dict] = {}
+    for card_uuid, position, count in card_rows:
+        item = by_card.setdefault(
+            card_uuid, {"card_uuid": card_uuid, "title": titles.get(card_uuid), "past": 0, "present": 0, "future": 0}
+        )
+        item[position] += count
+    cards = sorted(by_card.values(), key=lambda c: c["past"] + c["present"] + c["future"], reverse=True)
+    for c in cards:
+        c["total"] = c["past"] + c["present"] + c["future"]
+
+    hourly_since = since
+    if hourly_since is None:
+        hourly_since = (until or _ceil_hour(datetime.utcnow())) - HOURLY_WINDOW
+    hourly_query = (
+        select(TarotHourlyCounter.hour, TarotHourlyCounter.count)
+        .where(TarotHourlyCounter.hour >= hourly_since)
+        .order_by(TarotHourlyCounter.hour)
+    )
+    if until is not None:
+        hourly_query = hourly_query.where(TarotHourlyCounter.hour < until)
+    hourly = [{"hour": hour, "count": count} for hour, count in (await session.execute(hourly_query)).all()]
+
+    state = await session.get(TarotRollupState, 1)
+    return {
+        "since": since,
+        "until": until,
+        "cards": cards,
+        "hourly_since": hourly_since,
+        "hourly": hourly,
+        # У каждого расклада ровно одна карта «прошлого»
+        "total_readings": sum(c["past"] for c in cards),
+        "last_reading_id": state.last_reading_id if state else 0,
+    }
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value: datetime) -> datetime:
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+def _ranged_card_counts(since: datetime | None, until: datetime | None):
+    conditions = []
+    if since is not None:
+        conditions.append(TarotReading.created_at >= since)
+    if until is not None:
+        conditions.append(TarotReading.created_at < until)
+    parts = [
+        select(getattr(TarotReading, f"{pos}_card_uuid").label("card_uuid"), literal(pos).label("position")).where(
+            *conditions
+        )
+        for pos in POSITIONS
+    ]
+    drawn = union_all(*parts).subquery()
+    return select(drawn.c.card_uuid, drawn.c.position, func.count()).group_by(drawn.c.card_uuid, drawn.c.position)
@@ -0,0 +1,213 @@
+"""Content-addressed storage of admin image uploads in ``static/uploads``.
+
+Файл копируется кусками во временный файл (``.part``), одновременно
+считается sha256; при превышении лимита копирование прерывается и временный
+файл удаляется. Имя готового файла — хеш содержимого, разложенный по
+подкаталогам по первым двум символам: ``ab/abcdef....png``. Повторная загрузка
+той же картинки не создаёт копию и даёт тот же URL, поэтому такие файлы
+отдаются с долгим immutable-кешированием. Запись, хеширование и
+переименование выполняются в потоке, а не в event loop.
+
+Ссылки на файлы хранятся в ``TarotCard.image_url``; файлы, на которые никто
+не ссылается, удаляет ``collect_garbage`` (``scripts/gc_uploads.py``).
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid as uuid_lib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ImageVariant, TarotCard
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "static" / "uploads"
+UPLOADS_URL = "/girls/static/uploads"
+VARIANTS_DIR = UPLOADS_DIR / "variants"
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Путь внутри /static, имя которого выводится из содержимого: блоб или его уменьшенная копия
+_IMMUTABLE_PATH = re.compile(r"^uploads/(?:[0-9a-f]{2}|variants)/[0-9a-f]{64}[-.]")
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def blob_name(sha256: str, suffix: str) -> str:
+    """``static/uploads``-relative name of a blob: ``<sha[:2]>/<sha><suffix>``."""
+    return f"{sha256[:2]}/{sha256}{suffix}"
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    # hashlib отпускает GIL на больших буферах — хеш и запись не держат остальные потоки
+    digest.update(chunk)
+    f.write(chunk)
+
+
+def _discard(f, path: Path) -> None:
+    f.close()
+    path.unlink(missing_ok=True)
+
+
+def _store_blob(tmp_path: Path, sha256: str, suffix: str) -> tuple[str, bool]:
+    """Move ``tmp_path`` into its content-addressed place unless the same content is already stored."""
+    shard = UPLOADS_DIR / sha256[:2]
+    shard.mkdir(exist_ok=True)
+    # То же содержимое с другим расширением — тот же файл
+    existing = next(shard.glob(f"{sha256}.*"), None)
+    if existing is not None:
+        tmp_path.unlink(missing_ok=True)
+        # Обновляем mtime, чтобы сборщик мусора не удалил файл до сохранения ссылки на него
+        existing.touch()
+        return f"{sha256[:2]}/{existing.name}", False
+    name = blob_name(sha256, suffix)
+    os.replace(tmp_path, UPLOADS_DIR / name)
+    return name, True
+
+
+async def save_upload(file: UploadFile, suffix: str, max_bytes: int) -> tuple[str, str, bool]:
+    """Stream ``file`` into UPLOADS_DIR. Returns ``(file name, sha256 hex, created)``.
+
+    ``created`` is False when identical content was already stored (the existing
+    name is returned). Raises UploadTooLarge as soon as more than ``max_bytes`` have been read.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge
+    tmp_path = UPLOADS_DIR / f".{uuid_lib.uuid4().hex}{suffix}.part"
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+        await asyncio.to_thread(f.close)
+        sha256 = digest.hexdigest()
+        name, created = await asyncio.to_thread(_store_blob, tmp_path, sha256, suffix)
+    except BaseException:
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise
+    return name, sha256, created
+
+
+def source_name_from_url(image_url: str | None) -> str | None:
+    if not image_url or not image_url.startswith(UPLOADS_URL + "/"):
+        return None
+    return image_url[len(UPLOADS_URL) + 1 :]
+
+
+class UploadsStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed uploads as immutable."""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304) and _IMMUTABLE_PATH.match(path):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+@dataclass
+class GCReport:
+    referenced: int = 0
+    kept_recent: int = 0
+    removed: list[str] = field(default_factory=list)
+    freed_bytes: int = 0
+
+
+def _iter_blobs() -> list[Path]:
+    return [
+        p
+        for shard in UPLOADS_DIR.iterdir()
+        if shard.is_dir() and len(shard.name) == 2
+        for p in shard.iterdir()
+        if p.is_file() and _BLOB_NAME.match(p.name)
+    ]
+
+
+def _remove_blob(path: Path) -> int:
+    size = path.stat().st_size
+    path.unlink(missing_ok=True)
+    # Уменьшенные копии названы по хешу исходника
+    for variant in VARIANTS_DIR.glob(f"{path.stem}-*"):
+        size += variant.stat().st_size
+        variant.unlink(missing_ok=True)
+    if not any(path.parent.iterdir()):
+        path.parent.rmdir()
+    return size
+
+
+async def referenced_sources(session: AsyncSession) -> set[str]:
+    """Upload names referenced from ``TarotCard.image_url`` (active or not)."""
+    urls = (await session.execute(select(TarotCard.image_url).where(TarotCard.image_url.is_not(None)))).scalars()
+    return {name for name in map(source_name_from_url, urls) if name}
+
+
+async def collect_garbage(session: AsyncSession, grace_seconds: float, dry_run: bool = False) -> GCReport:
+    """Delete blobs (and their variants) nobody references.
+
+    Blobs younger than ``grace_seconds`` are kept: they may have just been
+    uploaded and not yet saved into a card.
+    """
+    referenced = await referenced_sources(session)
+    blobs = await asyncio.to_thread(_iter_blobs)
+    report = GCReport()
+    cutoff = time.time() - grace_seconds
+    for path in blobs:
+        name = f"{path.parent.name}/{path.name}"
+        if name in referenced:
+            report.referenced += 1
+            continue
+        if path.stat().st_mtime > cutoff:
+            report.kept_recent += 1
+            continue
+        report.removed.append(name)
+        if not dry_run:
+            report.freed_bytes += await asyncio.to_thread(_remove_blob, path)
+    if report.removed and not dry_run:
+        await session.execute(delete(ImageVariant).where(ImageVariant.source_name.in_(report.removed)))
+        await session.commit()
+    return report
+
+
+def _adopt_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    name, _ = _store_blob(path, digest.hexdigest(), path.suffix.lower())
+    return name
+
+
+async def adopt_legacy_uploads(session: AsyncSession) -> dict[str, str]:
+    """Move old ``uuid4().hex`` uploads into content-addressed storage and repoint card URLs.
+
+    Returns ``{old name: new name}``. Variants of moved files must be regenerated
+    (``scripts/backfill_image_variants.py``).
+    """
+    legacy = await asyncio.to_thread(
+        lambda: [p for p in UPLOADS_DIR.iterdir() if p.is_file() and not p.name.startswith(".")]
+    )
+    moved: dict[str, str] = {}
+    for path in legacy:
+        old_variants = await asyncio.to_thread(lambda: list(VARIANTS_DIR.glob(f"{path.stem}-*")))
+        moved[path.name] = await asyncio.to_thread(_adopt_file, path)
+        for variant in old_variants:
+            await asyncio.to_thread(variant.unlink, True)
+    for old, new in moved.items():
+        await session.execute(
+            update(TarotCard).where(TarotCard.image_url == f"{UPLOADS_URL}/{old}").values(image_url=f"{UPLOADS_URL}/{new}")
+        )
+    if moved:
+        await session.execute(delete(ImageVariant).where(ImageVariant.source_name.in_(list(moved))))
+    await session.commit()
+    return moved
@@ -0,0 +1,139 @@
+"""Startup warm-up: everything the first requests after a restart would pay for.
+
+Выполняется в lifespan до приёма трафика: открывает соединения пула БД
+(с применёнными PRAGMA), подгружает jose/passlib и почтовый клиент, читает
+каталог и предсказания гороскопа, затем прогоняет горячие эндпоинты внутри
+процесса — так собираются байты ответов, компилируются SQL-запросы в кеш
+SQLAlchemy и прогреваются сериализаторы. INSERT/UPDATE входа и сертификата
+компилируются в транзакции, которая откатывается, — в БД ничего не остаётся;
+метрики после прогрева обнуляются. ``WARMUP=false`` отключает прогрев.
+"""
+import asyncio
+import json
+import secrets
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select, text
+
+from app import auth
+from app.catalog import catalog
+from app.config import settings
+from app.database import async_session, engine
+from app.horoscope import horoscope_engine
+from app.horoscope_data import ROLES, SIGNS
+from app.metrics import metrics
+from app.models import AccessCode, Certificate, Girl
+from app.query_stats import query_stats
+
+# Запросы без записи в БД; неверные id/коды проходят те же SELECT, что и настоящие
+WARMUP_REQUESTS = (
+    ("GET", "/api/girls", None),
+    ("GET", "/api/games", None),
+    ("GET", "/api/tarot-cards", None),
+    ("GET", "/api/horoscope/roles", None),
+    ("GET", "/api/horoscope/signs", None),
+    ("GET", f"/api/horoscope/prediction?role_id={ROLES[0]['id']}&sign_id={SIGNS[0]['id']}", None),
+    ("POST", "/api/auth/request-code", {"girl_id": 0}),
+    ("POST", "/api/auth/verify", {"girl_id": 0, "code": "-"}),
+    # Невалидный токен: HTTPBearer + разбор JWT, ответ 401
+    ("POST", "/api/certificate", None),
+)
+
+
+@contextmanager
+def _step(timings: dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def open_pool(connections: int) -> None:
+    """Check out ``connections`` connections at once so the pool keeps them open."""
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(max(connections, 1))))
+
+
+async def compile_write_statements() -> None:
+    """Flush the ORM writes of request-code, verify and certificate, then roll back."""
+    async with async_session() as session:
+        girl_id = (await session.execute(select(Girl.id).limit(1))).scalar_one_or_none()
+        if girl_id is None:
+            return
+        access = AccessCode(girl_id=girl_id, code="WARMUP", expires_at=datetime.utcnow())
+        session.add(access)
+        await session.flush()
+        access.used_at = datetime.utcnow()
+        await session.flush()
+        session.add(Certificate(girl_id=girl_id, token=f"warmup-{secrets.token_urlsafe(16)}"))
+        await session.flush()
+        await session.rollback()
+
+
+async def asgi_request(app, method: str, path: str, body: dict | None = None) -> int:
+    """Run one request through ``app`` in-process; returns the status code."""
+    raw_path, _, query = path.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"warmup"), (b"accept-encoding", b"gzip, br"), (b"authorization", b"Bearer warmup")]
+    if body is not None:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": raw_path,
+        "raw_path": raw_path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80),
+    }
+    status = 0
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm_up(app) -> dict[str, float]:
+    """Run all warm-up steps; returns milliseconds per step."""
+    timings: dict[str, float] = {}
+    with _step(timings, "db_pool"):
+        await open_pool(min(settings.warmup_connections, settings.db_pool_size))
+    with _step(timings, "imports"):
+        auth.preload()
+    with _step(timings, "catalog"):
+        async with async_session() as session:
+            await catalog.get(session)
+            await horoscope_engine.predictions(session)
+    with _step(timings, "sql_writes"):
+        await compile_write_statements()
+    with _step(timings, "requests"):
+        for method, path, body in WARMUP_REQUESTS:
+            await asgi_request(app, method, path, body)
+    # Прогрев — не трафик
+    metrics.clear()
+    query_stats.clear()
+    return timings
@@ -0,0 +1,315 @@
+"""Load test of the public API with a realistic request mix.
+
+Virtual users log in (list girls -> request-code -> verify) and then loop over a
+weighted mix of girls / tarot deck / tarot draw / horoscope / certificate
+requests, re-logging in now and then. Runs against a fresh temporary SQLite
+database or, with ``--database-url``, a scratch PostgreSQL database (migrated
+and seeded) either in-process through httpx's ASGI transport or against a
+local uvicorn (one or several workers). Email goes to a stub: the
+code is read back from the database.
+
+Reports throughput and p50/p95/p99 per endpoint and writes the results to
+``benchmarks/results/*.json``; ``--compare`` prints the change against an
+earlier result file.
+
+Usage: python benchmarks/load_api.py [--target asgi|uvicorn] [--workers 1] [--users 32]
+                                     [--duration 15] [--warmup 3] [--girls 200]
+                                     [--database-url postgresql+asyncpg://...]
+                                     [--out results.json] [--compare base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+
+# Доля операций в цикле виртуального пользователя (после первого входа)
+MIX = {
+    "list_girls": 20,
+    "tarot_cards": 15,
+    "tarot_draw": 25,
+    "horoscope": 25,
+    "certificate": 10,
+    "login": 5,
+}
+SEED_SCRIPTS = ("seed_games.py", "seed_tarot_cards.py", "seed_horoscope_predictions.py")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.recording = False
+        self.timings: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    async def call(self, name: str, request) -> httpx.Response | None:
+        t = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        elapsed = (time.perf_counter() - t) * 1000
+        if self.recording:
+            self.timings.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return response if ok else None
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    index = min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(timings: list[float], errors: int, seconds: float) -> dict:
+    values = sorted(timings)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / seconds, 1),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+async def prepare_database(database_url: str, girls: int) -> None:
+    from sqlalchemy import insert
+    from sqlalchemy.engine import make_url
+
+    env = {**os.environ, "DATABASE_URL": database_url}
+    commands = [["-m", "alembic", "upgrade", "head"], *(["scripts/" + script] for script in SEED_SCRIPTS)]
+    if make_url(database_url).get_backend_name() != "sqlite":
+        # Внешняя БД не временная: схема пересоздаётся миграциями с нуля
+        commands.insert(0, ["-m", "alembic", "downgrade", "base"])
+    for cmd in commands:
+        subprocess.run([sys.executable, *cmd], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+    from app.database import make_engine
+    from app.models import Girl
+
+    engine = make_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(Girl), [{"name": f"Девушка {i}", "email": f"girl{i}@example.com"} for i in range(1, girls + 1)]
+        )
+    await engine.dispose()
+
+
+class CodeReader:
+    """Reads the latest access code of a girl — stands in for her mailbox."""
+
+    def __init__(self, database_url: str) -> None:
+        from app.database import make_engine
+
+        self.engine = make_engine(database_url)
+
+    async def latest(self, girl_id: int) -> str | None:
+        from sqlalchemy import select
+
+        from app.models import AccessCode
+
+        async with self.engine.connect() as conn:
+            return (
+                await conn.execute(
+                    select(AccessCode.code)
+                    .where(AccessCode.girl_id == girl_id, AccessCode.used_at.is_(None))
+                    .order_by(AccessCode.id.desc())
+                    .limit(1)
+                )
+            ).scalar_one_or_none()
+
+
+async def virtual_user(client: httpx.AsyncClient, rec: Recorder, codes: CodeReader, girl_id: int,
+                       deadline: float, roles: list[str], signs: list[str]) -> None:
+    names = list(MIX)
+    weights = list(MIX.values())
+    token: str | None = None
+    op = "login"
+    while time.perf_counter() < deadline:
+        if op == "login" or token is None:
+            await rec.call("list_girls", client.get("/api/girls"))
+            if await rec.call("request_code", client.post("/api/auth/request-code", json={"girl_id": girl_id})):
+                code = await codes.latest(girl_id)
+                r = await rec.call("verify", client.post("/api/auth/verify", json={"girl_id": girl_id, "code": code}))
+                token = r.json()["access_token"] if r is not None else None
+        elif op == "list_girls":
+            await rec.call("list_girls", client.get("/api/girls"))
+        elif op == "tarot_cards":
+            await rec.call("tarot_cards", client.get("/api/tarot-cards"))
+        elif op == "tarot_draw":
+            await rec.call("tarot_draw", client.post("/api/tarot-cards/draw", json={"count": 3, "question": "Что меня ждёт?"}))
+        elif op == "horoscope":
+            params = {"role_id": random.choice(roles), "sign_id": random.choice(signs)}
+            await rec.call("horoscope", client.get("/api/horoscope/prediction", params=params))
+        elif op == "certificate":
+            await rec.call("certificate", client.post("/api/certificate", headers={"Authorization": f"Bearer {token}"}))
+        op = random.choices(names, weights)[0]
+
+
+async def run_load(client: httpx.AsyncClient, codes: CodeReader, args) -> tuple[Recorder, float]:
+    roles = [r["id"] for r in (await client.get("/api/horoscope/roles")).json()]
+    signs = [s["id"] for s in (await client.get("/api/horoscope/signs")).json()]
+    rec = Recorder()
+    start = time.perf_counter()
+    deadline = start + args.warmup + args.duration
+    users = [
+        asyncio.create_task(virtual_user(client, rec, codes, i % args.girls + 1, deadline, roles, signs))
+        for i in range(args.users)
+    ]
+    await asyncio.sleep(args.warmup)
+    rec.recording = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*users)
+    return rec, time.perf_counter() - measured_from
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(database_url: str, args) -> tuple[Recorder, float]:
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    codes = CodeReader(database_url)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            for _ in range(200):
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.05)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            return await run_load(client, codes, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        await codes.engine.dispose()
+
+
+async def run_asgi(database_url: str, args) -> tuple[Recorder, float]:
+    from app import email_queue as email_queue_module
+    from app.main import app
+
+    async def stub_send(to_email: str, code: str, girl_name: str) -> None:
+        pass
+
+    # Заглушка почты: код берётся из БД (CodeReader)
+    email_queue_module.send_code_email = stub_send
+    codes = CodeReader(database_url)
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+                return await run_load(client, codes, args)
+    finally:
+        await codes.engine.dispose()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict, base: dict | None) -> None:
+    print(f"{'endpoint':<14}{'req':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = {**result["endpoints"], "TOTAL": result["total"]}
+    for name, s in rows.items():
+        line = f"{name:<14}{s['requests']:>8}{s['errors']:>6}{s['rps']:>9}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+        old = (base or {}).get("endpoints", {}).get(name) if name != "TOTAL" else (base or {}).get("total")
+        if old:
+            delta = lambda key: (s[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            line += f"   rps {delta('rps'):+.0f}%  p95 {delta('p95_ms'):+.0f}%  p99 {delta('p99_ms'):+.0f}%"
+        print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--girls", type=int, default=200)
+    parser.add_argument(
+        "--database-url", help="scratch database, e.g. postgresql+asyncpg://... (all its tables are dropped!); default: temporary SQLite"
+    )
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<time>-<commit>-<target>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+    args.girls = max(args.girls, args.users)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{tmp}/bench.db"
+        # Настройки читаются при импорте app — до него подменяем БД и отключаем почту
+        os.environ.update(DATABASE_URL=database_url, SMTP_HOST="", SMTP_BZ_API_KEY="")
+        await prepare_database(database_url, args.girls)
+        if args.target == "asgi":
+            rec, seconds = await run_asgi(database_url, args)
+        else:
+            rec, seconds = await run_uvicorn(database_url, args)
+
+    all_timings = [t for ts in rec.timings.values() for t in ts]
+    commit = _git_commit()
+    result = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit,
+            "target": args.target,
+            "database": database_url.split(":", 1)[0],
+            "workers": args.workers if args.target == "uvicorn" else None,
+            "users": args.users,
+            "duration_s": round(seconds, 2),
+            "mix": MIX,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "endpoints": {
+            name: summarize(ts, rec.errors.get(name, 0), seconds) for name, ts in sorted(rec.timings.items())
+        },
+        "total": summarize(all_timings, sum(rec.errors.values()), seconds),
+    }
+    base = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, base)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}-{args.target}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
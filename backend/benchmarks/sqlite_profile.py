@@ -0,0 +1,87 @@
+"""SQLite read/write throughput with and without the connection profile from app/database.py.
+
+Readers select the tarot deck, writers insert TarotReading rows (one commit each),
+all concurrently against a fresh temporary database file.
+
+Usage: python benchmarks/sqlite_profile.py [--seconds 5] [--readers 8] [--writers 4]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import Base, make_engine
+from app.models import TarotCard, TarotReading
+
+
+async def run_mode(tuned: bool, seconds: float, readers: int, writers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp}/bench.db", sqlite_tuning=tuned)
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as session:
+            session.add_all(
+                TarotCard(uuid=f"card-{i}", title=f"Card {i}", description="x" * 200, sort_order=i)
+                for i in range(10)
+            )
+            await session.commit()
+
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        deadline = time.monotonic() + seconds
+
+        async def reader():
+            while time.monotonic() < deadline:
+                try:
+                    async with sessions() as session:
+                        result = await session.execute(
+                            select(TarotCard).where(TarotCard.is_active).order_by(TarotCard.sort_order, TarotCard.id)
+                        )
+                        result.scalars().all()
+                    counts["reads"] += 1
+                except OperationalError:
+                    counts["errors"] += 1
+
+        async def writer():
+            while time.monotonic() < deadline:
+                try:
+                    async with sessions() as session:
+                        session.add(
+                            TarotReading(past_card_uuid="card-1", present_card_uuid="card-2", future_card_uuid="card-3")
+                        )
+                        await session.commit()
+                    counts["writes"] += 1
+                except OperationalError:
+                    counts["errors"] += 1
+
+        await asyncio.gather(*[reader() for _ in range(readers)], *[writer() for _ in range(writers)])
+        await engine.dispose()
+    return {
+        "mode": "tuned" if tuned else "default",
+        "reads_per_s": round(counts["reads"] / seconds, 1),
+        "writes_per_s": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+    for tuned in (False, True):
+        r = await run_mode(tuned, args.seconds, args.readers, args.writers)
+        print(f"{r['mode']:>8}: {r['reads_per_s']:>9} reads/s  {r['writes_per_s']:>8} writes/s  errors: {r['errors']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""Import time, startup time and first-request latency of the API.
+
+1. ``import app.main`` in fresh interpreters (median) and a check that heavy
+   modules the health check does not need (jose, passlib, httpx, Pillow, ...)
+   are not imported by it.
+2. uvicorn on a fresh migrated and seeded database (temporary SQLite or the
+   scratch database from ``--database-url``), with and without the
+   lifespan warm-up: time until ``/api/health`` answers, then the latency of the
+   first request to each hot endpoint next to its steady-state median.
+
+Exits with code 1 when ``--max-import-ms`` / ``--max-first-ms`` are exceeded or
+a lazy module is imported eagerly, so it can guard against regressions.
+
+Usage: python benchmarks/startup.py [--runs 5] [--max-import-ms 1500] [--max-first-ms 100]
+                                    [--database-url postgresql+asyncpg://...] [--out startup.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from benchmarks.load_api import BACKEND_DIR, CodeReader, _free_port, prepare_database
+
+# Не нужны для импорта приложения и /api/health — подгружаются лениво или прогревом
+LAZY_MODULES = ("jose", "passlib", "httpx", "aiosmtplib", "PIL", "multiprocessing", "concurrent.futures.process")
+IMPORT_PROBE = (
+    "import sys, time, json; t = time.perf_counter(); import app.main; "
+    "print(json.dumps({'ms': (time.perf_counter() - t) * 1000, 'loaded': [m for m in %r if m in sys.modules]}))"
+) % (LAZY_MODULES,)
+STEADY_REPEATS = 20
+
+
+def measure_import(runs: int) -> dict:
+    samples, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        probe = json.loads(out.strip().splitlines()[-1])
+        samples.append(probe["ms"])
+        loaded.update(probe["loaded"])
+    return {"median_ms": round(statistics.median(samples), 1), "max_ms": round(max(samples), 1),
+            "eager_lazy_modules": sorted(loaded)}
+
+
+async def timed(request) -> float:
+    t = time.perf_counter()
+    response = await request
+    response.raise_for_status()
+    return (time.perf_counter() - t) * 1000
+
+
+async def measure_server(database_url: str, warmup: bool) -> dict:
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "WARMUP": str(warmup).lower()}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    codes = CodeReader(database_url)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.01)
+            ready_ms = (time.perf_counter() - started) * 1000
+
+            async def login():
+                await client.post("/api/auth/request-code", json={"girl_id": 1})
+                code = await codes.latest(1)
+                r = await client.post("/api/auth/verify", json={"girl_id": 1, "code": code})
+                r.raise_for_status()
+                return r
+
+            token = None
+
+            async def call(name: str):
+                nonlocal token
+                if name == "girls":
+                    return await timed(client.get("/api/girls"))
+                if name == "tarot_cards":
+                    return await timed(client.get("/api/tarot-cards"))
+                if name == "horoscope":
+                    return await timed(client.get("/api/horoscope/prediction", params={"role_id": "tester", "sign_id": "aries"}))
+                if name == "login":
+                    t = time.perf_counter()
+                    token = (await login()).json()["access_token"]
+                    return (time.perf_counter() - t) * 1000
+                if name == "certificate":
+                    return await timed(client.post("/api/certificate", headers={"Authorization": f"Bearer {token}"}))
+
+            endpoints = {}
+            for name in ("girls", "tarot_cards", "horoscope", "login", "certificate"):
+                first = await call(name)
+                steady = statistics.median([await call(name) for _ in range(STEADY_REPEATS)])
+                endpoints[name] = {"first_ms": round(first, 2), "steady_ms": round(steady, 2)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        await codes.engine.dispose()
+    return {"ready_ms": round(ready_ms, 1), "endpoints": endpoints}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the import measurement")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-ms", type=float, default=None, help="limit for first requests with warm-up")
+    parser.add_argument(
+        "--database-url", help="scratch database, e.g. postgresql+asyncpg://... (all its tables are dropped!); default: temporary SQLite"
+    )
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    result = {"import": measure_import(args.runs), "server": {}}
+    for warmup in (True, False):
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = args.database_url or f"sqlite+aiosqlite:///{tmp}/bench.db"
+            os.environ.update(DATABASE_URL=database_url, SMTP_HOST="", SMTP_BZ_API_KEY="")
+            await prepare_database(database_url, girls=10)
+            result["server"]["warmup" if warmup else "no_warmup"] = await measure_server(database_url, warmup)
+
+    imp = result["import"]
+    print(f"import app.main: median {imp['median_ms']} ms, max {imp['max_ms']} ms")
+    for mode, data in result["server"].items():
+        print(f"{mode}: ready in {data['ready_ms']} ms")
+        for name, e in data["endpoints"].items():
+            print(f"  {name:<12} first {e['first_ms']:>8.2f} ms   steady {e['steady_ms']:>7.2f} ms")
+
+    failures = []
+    if imp["eager_lazy_modules"]:
+        failures.append(f"imported eagerly: {', '.join(imp['eager_lazy_modules'])}")
+    if args.max_import_ms is not None and imp["median_ms"] > args.max_import_ms:
+        failures.append(f"import {imp['median_ms']} ms > {args.max_import_ms} ms")
+    if args.max_first_ms is not None:
+        for name, e in result["server"]["warmup"]["endpoints"].items():
+            if e["first_ms"] > args.max_first_ms:
+                failures.append(f"first {name} {e['first_ms']} ms > {args.max_first_ms} ms")
+    result["failures"] = failures
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, ensure_ascii=False, indent=2))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
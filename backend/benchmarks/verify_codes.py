@@ -0,0 +1,92 @@
+"""Latency of the verify_code lookup as historical access codes accumulate.
+
+Grows a temporary database of used/expired codes spread over many girls and
+times the exact query from ``verify_code`` at each size (it should stay flat),
+then once more with the access_codes indexes dropped for comparison.
+
+Usage: python benchmarks/verify_codes.py [--sizes 10000,100000,1000000] [--girls 1000] [--queries 2000]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, select, text
+
+from app.database import Base, make_engine
+from app.models import AccessCode, Girl
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--girls", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                insert(Girl), [{"name": f"G{i}", "email": f"g{i}@example.com"} for i in range(1, args.girls + 1)]
+            )
+        async def grow_to(rows: int, current: int) -> None:
+            now = datetime.utcnow()
+            async with engine.begin() as conn:
+                for start in range(current, rows, 50_000):
+                    n = min(50_000, rows - start)
+                    await conn.execute(
+                        insert(AccessCode),
+                        [
+                            {
+                                "girl_id": random.randint(1, args.girls),
+                                "code": f"{random.getrandbits(32):08X}",
+                                "used_at": now - timedelta(hours=1) if i % 2 else None,
+                                "expires_at": now - timedelta(hours=random.randint(1, 1000)),
+                            }
+                            for i in range(n)
+                        ],
+                    )
+
+        async def measure(label: str, rows: int):
+            timings = []
+            async with engine.connect() as conn:
+                for _ in range(args.queries):
+                    girl_id = random.randint(1, args.girls)
+                    code = f"{random.getrandbits(32):08X}"
+                    t = time.perf_counter()
+                    await conn.execute(
+                        select(AccessCode).where(
+                            AccessCode.girl_id == girl_id,
+                            AccessCode.code == code,
+                            AccessCode.used_at.is_(None),
+                            AccessCode.expires_at > datetime.utcnow(),
+                        )
+                    )
+                    timings.append((time.perf_counter() - t) * 1000)
+            timings.sort()
+            p99 = timings[int(len(timings) * 0.99) - 1]
+            print(f"{label:>10}: {rows:>9} codes  p50 {statistics.median(timings):.3f} ms  p99 {p99:.3f} ms")
+
+        rows = 0
+        for size in sorted(int(s) for s in args.sizes.split(",")):
+            await grow_to(size, rows)
+            rows = size
+            await measure("indexed", rows)
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_access_codes_verify"))
+            await conn.execute(text("DROP INDEX ix_access_codes_code"))
+        await measure("no index", rows)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
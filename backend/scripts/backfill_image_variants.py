@@ -0,0 +1,45 @@
+"""Generate resized WebP/JPEG variants for uploads that do not have them yet. Run after migrations.
+
+Usage: python scripts/backfill_image_variants.py [--force]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select
+
+from app import image_variants
+from app.database import async_session
+from app.models import ImageVariant
+from app.table_versions import IMAGE_VARIANTS, bump_shared
+from app.uploads import UPLOADS_DIR
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+async def backfill(force: bool = False):
+    async with async_session() as session:
+        done = set((await session.execute(select(ImageVariant.source_name).distinct())).scalars().all())
+    # Файлы по хешу лежат в подкаталогах ab/, старые (uuid) — в корне uploads
+    files = [*UPLOADS_DIR.iterdir(), *(p for d in UPLOADS_DIR.iterdir() if d.is_dir() and len(d.name) == 2 for p in d.iterdir())]
+    sources = sorted(
+        p.relative_to(UPLOADS_DIR).as_posix()
+        for p in files
+        if p.is_file() and not p.name.startswith(".") and p.suffix.lower() in IMAGE_SUFFIXES
+    )
+    sources = [name for name in sources if force or name not in done]
+    results = await asyncio.gather(*(image_variants.generate_variants(name) for name in sources), return_exceptions=True)
+    for name, result in zip(sources, results):
+        if isinstance(result, Exception):
+            print(f"{name}: error {result!r}")
+        else:
+            print(f"{name}: {len(result)} variants")
+    image_variants.shutdown()
+    if sources:
+        bump_shared(IMAGE_VARIANTS)
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill(force="--force" in sys.argv))
@@ -0,0 +1,46 @@
+"""Delete uploaded images that no tarot card references, together with their variants.
+
+Usage: python scripts/gc_uploads.py [--dry-run] [--grace-hours N] [--adopt-legacy]
+
+--adopt-legacy сначала переносит старые файлы с uuid-именами в хранилище по хешу
+и обновляет ссылки карт; после этого нужен scripts/backfill_image_variants.py.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings
+from app.database import async_session
+from app.table_versions import IMAGE_VARIANTS, TAROT_CARDS, bump_shared
+from app.uploads import adopt_legacy_uploads, collect_garbage
+
+
+async def main(dry_run: bool, grace_hours: float, adopt_legacy: bool):
+    async with async_session() as session:
+        if adopt_legacy and not dry_run:
+            moved = await adopt_legacy_uploads(session)
+            for old, new in moved.items():
+                print(f"{old} -> {new}")
+            print(f"Adopted {len(moved)} legacy uploads")
+        report = await collect_garbage(session, grace_hours * 3600, dry_run=dry_run)
+    if not dry_run:
+        # Ссылки карт (--adopt-legacy) и записи вариантов изменились — каталог API пересоберётся
+        bump_shared(TAROT_CARDS, IMAGE_VARIANTS)
+    for name in report.removed:
+        print(f"{'would remove' if dry_run else 'removed'}: {name}")
+    print(
+        f"Referenced: {report.referenced}, kept (recent): {report.kept_recent}, "
+        f"removed: {len(report.removed)}, freed: {report.freed_bytes} bytes"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--grace-hours", type=float, default=settings.upload_gc_grace_hours)
+    parser.add_argument("--adopt-legacy", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run, args.grace_hours, args.adopt_legacy))
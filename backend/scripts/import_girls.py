@@ -0,0 +1,40 @@
+"""Import girls from a CSV or NDJSON file (upsert by email). Run after migrations.
+
+Usage: python scripts/import_girls.py girls.csv [--format csv|ndjson]
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import async_session
+from app.girls_import import FORMATS, detect_format, import_girls
+from app.table_versions import GIRLS, bump_shared
+
+
+async def run(path: str, fmt: str):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        async with async_session() as session:
+            report = await import_girls(session, f, fmt)
+    # Запущенный API сбросит кеш девушек и ETag списка
+    bump_shared(GIRLS)
+    print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    fmt = None
+    if "--format" in args:
+        i = args.index("--format")
+        fmt = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(1)
+    fmt = fmt or detect_format(args[0])
+    if fmt not in FORMATS:
+        print("Unknown format: use .csv/.ndjson file or --format csv|ndjson")
+        sys.exit(1)
+    asyncio.run(run(args[0], fmt))
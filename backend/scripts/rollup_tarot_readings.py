@@ -0,0 +1,13 @@
+"""Count tarot readings not yet included in the analytics rollups. Run after migrations."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.tarot_stats import catch_up
+
+
+if __name__ == "__main__":
+    n = asyncio.run(catch_up())
+    print(f"Tarot rollups updated: {n} readings processed.")
@@ -8,6 +8,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from sqlalchemy import select
 from app.database import async_session, engine
 from app.models import Game, Base
+from app.table_versions import GAMES as GAMES_TABLE, bump_shared
 
 
 GAMES = [
@@ -28,6 +29,7 @@ async def seed():
             if r.scalar_one_or_none() is None:
                 session.add(Game(**g))
         await session.commit()
+    bump_shared(GAMES_TABLE)
 
 
 if __name__ == "__main__":
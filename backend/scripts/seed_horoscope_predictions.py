@@ -9,6 +9,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from sqlalchemy import select, delete
 from app.database import async_session
 from app.models import HoroscopePrediction
+from app.table_versions import HOROSCOPE_PREDICTIONS, bump_shared
 
 
 # Каждое предсказание — 5–6 предложений в шуточном тоне про ИТ и аутентификацию
@@ -87,6 +88,7 @@ async def seed(force: bool = False):
                 )
             )
         await session.commit()
+    bump_shared(HOROSCOPE_PREDICTIONS)
     print("Horoscope predictions seeded.")
 
 
@@ -8,6 +8,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from sqlalchemy import select
 from app.database import async_session
 from app.models import TarotCard
+from app.table_versions import TAROT_CARDS, bump_shared
 
 
 CARDS = [
@@ -31,6 +32,7 @@ async def seed():
             if r.scalar_one_or_none() is None:
                 session.add(TarotCard(**c))
         await session.commit()
+    bump_shared(TAROT_CARDS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+from jose import jwt
+
+from app.auth import create_access_token, decode_access_token, token_cache
+from app.config import settings
+
+
+def test_signed_token_without_exp_is_accepted():
+    token = jwt.encode({"sub": "7"}, settings.secret_key, algorithm="HS256")
+    assert decode_access_token(token) == 7
+    # Второй раз — из кеша
+    assert decode_access_token(token) == 7
+    token_cache.clear()
+
+
+def test_regular_token_round_trip():
+    assert decode_access_token(create_access_token(3)) == 3
+    token_cache.clear()
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import email_queue as module
+from app.database import Base, make_engine
+from app.email_queue import EmailQueue
+from app.models import AccessCode, Girl
+from app.routers import public
+from app.schemas import RequestCodeIn
+
+
+def test_stop_timeout_dead_letters_jobs_in_flight_and_in_backoff(monkeypatch):
+    async def send(to_email, code, girl_name):
+        if to_email == "slow@example.com":
+            await asyncio.sleep(10)
+        elif to_email == "flaky@example.com":
+            raise OSError("smtp down")
+
+    monkeypatch.setattr(module, "send_code_email", send)
+
+    async def scenario():
+        queue = EmailQueue(concurrency=2, max_attempts=5, retry_base_seconds=10, maxsize=10)
+        queue.enqueue("slow@example.com", "A", "Slow")
+        queue.enqueue("flaky@example.com", "B", "Flaky")
+        queue.enqueue("queued@example.com", "C", "Queued")
+        await asyncio.sleep(0.05)
+        await queue.stop(timeout=0.05)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.failed == 3
+    assert sorted(d.to_email for d in queue.dead_letters) == [
+        "flaky@example.com",
+        "queued@example.com",
+        "slow@example.com",
+    ]
+    assert not queue.running
+
+
+class FullQueue:
+    def enqueue(self, to_email, code, girl_name):
+        return False
+
+
+def test_request_code_with_full_queue_leaves_no_code(monkeypatch, tmp_path):
+    monkeypatch.setattr(public, "email_queue", FullQueue())
+
+    async def scenario():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'codes.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as session:
+            session.add(Girl(name="Аня", email="anya@example.com"))
+            await session.commit()
+        async with session_factory() as session:
+            with pytest.raises(HTTPException) as error:
+                await public.request_code(RequestCodeIn(girl_id=1), session)
+        async with session_factory() as session:
+            codes = (await session.execute(select(func.count()).select_from(AccessCode))).scalar_one()
+        await engine.dispose()
+        return error.value.status_code, codes
+
+    assert asyncio.run(scenario()) == (503, 0)
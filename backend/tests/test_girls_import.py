@@ -0,0 +1,34 @@
+import asyncio
+import io
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import Base, make_engine
+from app.girls_import import import_girls
+from app.models import Girl
+
+
+def test_decode_error_mid_file_keeps_rows_before_it(tmp_path):
+    rows = [f"Girl {i},girl{i}@example.com,\n".encode() for i in range(1500)]
+    rows[1200] = b"\xff\xfe broken,broken@example.com,\n"
+    data = io.BytesIO(b"name,email,gift_certificate_url\n" + b"".join(rows))
+
+    async def scenario():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'girls.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        lines = io.TextIOWrapper(data, encoding="utf-8-sig", newline="")
+        async with session_factory() as session:
+            report = await import_girls(session, lines, "csv")
+        async with session_factory() as session:
+            saved = (await session.execute(select(func.count()).select_from(Girl))).scalar_one()
+        await engine.dispose()
+        return report, saved
+
+    report, saved = asyncio.run(scenario())
+    assert report.stopped
+    assert report.error_count == 1
+    assert 1000 <= report.processed < 1500
+    assert saved == report.processed
@@ -0,0 +1,19 @@
+from PIL import Image
+
+from app.image_variants import render_variants
+
+
+def test_exif_orientation_is_applied(tmp_path):
+    source = tmp_path / "portrait.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой
+    Image.new("RGB", (1600, 900), "red").save(source, "JPEG", exif=exif)
+
+    variants = render_variants(str(source), str(tmp_path / "out"))
+
+    assert {v["width"] for v in variants} == {320, 640}
+    for v in variants:
+        with Image.open(tmp_path / "out" / v["name"]) as img:
+            assert img.width == v["width"]
+            assert img.height > img.width
+            assert img.getexif().get(0x0112) is None
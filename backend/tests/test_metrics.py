@@ -0,0 +1,12 @@
+from app.metrics import UNMATCHED, Metrics
+
+
+def test_unknown_methods_share_one_series():
+    metrics = Metrics()
+    for i in range(50):
+        metrics.observe(f"FOO{i}", UNMATCHED, 405, 0.001)
+    metrics.observe("GET", UNMATCHED, 404, 0.001)
+
+    assert set(metrics.latency) == {("OTHER", UNMATCHED), ("GET", UNMATCHED)}
+    assert metrics.requests[("OTHER", UNMATCHED, "4xx")] == 50
+    assert 'method="OTHER"' in metrics.render()
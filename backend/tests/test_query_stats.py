@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import make_engine
+from app.query_stats import QueryStats, RequestQueries, current_queries, instrument_engine, untracked
+from app import query_stats as module
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = QueryStats(slow_samples=10)
+    monkeypatch.setattr(module, "query_stats", fresh)
+    return fresh
+
+
+def test_failed_statements_are_counted_and_do_not_leak(stats):
+    async def scenario():
+        engine = make_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine)
+        request = RequestQueries()
+        token = current_queries.set(request)
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM no_such_table"))
+                await conn.execute(text("SELECT 2"))
+                leftovers = dict(conn.sync_connection.info)
+        finally:
+            current_queries.reset(token)
+            await engine.dispose()
+        return request, leftovers
+
+    request, leftovers = asyncio.run(scenario())
+    assert request.count == 3
+    assert "query_started" not in leftovers
+
+
+def test_tasks_spawned_from_request_are_untracked(stats):
+    async def scenario():
+        engine = make_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine)
+
+        async def background():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        request = RequestQueries()
+        token = current_queries.set(request)
+        task = asyncio.create_task(untracked(background()))
+        current_queries.reset(token)
+        await task
+        await engine.dispose()
+        return request
+
+    request = asyncio.run(scenario())
+    assert request.count == 0
+    assert stats.untracked == 1
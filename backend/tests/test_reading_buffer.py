@@ -0,0 +1,34 @@
+import asyncio
+
+from app import reading_buffer as module
+from app.reading_buffer import ReadingBuffer
+
+
+def test_stop_during_slow_write_keeps_batch(monkeypatch):
+    written: list[dict] = []
+    write_started = asyncio.Event()
+
+    async def slow_write(rows):
+        write_started.set()
+        await asyncio.sleep(0.2)
+        written.extend(rows)
+
+    monkeypatch.setattr(module, "write_readings", slow_write)
+
+    async def scenario():
+        buffer = ReadingBuffer(max_rows=100, flush_rows=3, flush_interval_ms=1000)
+        buffer.start()
+        for i in range(3):
+            buffer.add(None, f"p{i}", f"c{i}", f"f{i}")
+        await write_started.wait()
+        # Строка, пришедшая во время записи, тоже должна попасть в финальный flush
+        buffer.add(None, "p", "c", "f")
+        await buffer.stop()
+        return buffer.stats()
+
+    stats = asyncio.run(scenario())
+    assert len(written) == 4
+    assert stats["written"] == 4
+    assert stats["pending"] == 0
+    assert stats["dropped"] == 0
+    assert not stats["running"]
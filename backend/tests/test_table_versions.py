@@ -0,0 +1,34 @@
+import os
+import stat
+
+import pytest
+
+from app import table_versions as module
+from app.config import settings
+
+
+def test_default_path_is_private_and_depends_on_absolute_sqlite_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(module.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(settings, "table_versions_file", "")
+    monkeypatch.setattr(settings, "database_url", "sqlite+aiosqlite:///./girls.db")
+
+    monkeypatch.chdir(tmp_path)
+    first = module.shared_file_path()
+    (tmp_path / "other").mkdir()
+    monkeypatch.chdir(tmp_path / "other")
+    second = module.shared_file_path()
+
+    assert first != second
+    directory = os.path.dirname(first)
+    assert directory == str(tmp_path / f"girls-{os.getuid()}")
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_foreign_or_open_directory_is_refused(monkeypatch, tmp_path):
+    monkeypatch.setattr(module.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(settings, "table_versions_file", "")
+    os.mkdir(tmp_path / f"girls-{os.getuid()}", 0o777)
+    os.chmod(tmp_path / f"girls-{os.getuid()}", 0o777)
+
+    with pytest.raises(RuntimeError):
+        module.shared_file_path()
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import Base, make_engine
+from app.models import TarotCardCounter, TarotRollupState
+from app.routers.admin import _naive_utc
+from app.tarot_stats import insert_readings, tarot_stats
+
+
+def reading(past: str, present: str, future: str, created_at: datetime | None = None) -> dict:
+    return {
+        "question_text": None,
+        "past_card_uuid": past,
+        "present_card_uuid": present,
+        "future_card_uuid": future,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def test_inserted_readings_are_counted_in_the_same_transaction(tmp_path):
+    async def scenario():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'tarot.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        # Без строки состояния (база до сида в миграции 005) она создаётся на месте
+        async with session_factory() as session:
+            await insert_readings(session, [reading("a", "b", "c"), reading("a", "c", "b")])
+        async with session_factory() as session:
+            await insert_readings(session, [reading("a", "b", "c")])
+        async with session_factory() as session:
+            state = (await session.execute(select(TarotRollupState))).scalar_one()
+            counters = {
+                (c.card_uuid, c.position): c.count
+                for c in (await session.execute(select(TarotCardCounter))).scalars()
+            }
+        await engine.dispose()
+        return state, counters
+
+    state, counters = asyncio.run(scenario())
+    assert state.last_reading_id == 3
+    assert counters[("a", "past")] == 3
+    assert counters[("b", "present")] == 2
+    assert counters[("b", "future")] == 1
+
+
+def test_range_is_hour_aligned_for_cards_and_hourly(tmp_path):
+    now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+
+    async def scenario():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'tarot.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as session:
+            await insert_readings(
+                session,
+                [
+                    reading("old", "b", "c", now - timedelta(days=30)),
+                    reading("a", "b", "c", now - timedelta(hours=2)),
+                    reading("a", "b", "c", now),
+                ],
+            )
+        async with session_factory() as session:
+            ranged = await tarot_stats(session, now - timedelta(hours=2, minutes=10), now - timedelta(minutes=20))
+            default = await tarot_stats(session)
+        await engine.dispose()
+        return ranged, default
+
+    ranged, default = asyncio.run(scenario())
+    # [since, until) округлены до [-3ч, +1ч) от начала часа: оба расклада внутри
+    assert ranged["total_readings"] == 2
+    assert sum(h["count"] for h in ranged["hourly"]) == 2
+    # Без диапазона карты — за всё время, почасовой ряд — только за HOURLY_WINDOW
+    assert default["total_readings"] == 3
+    assert sum(h["count"] for h in default["hourly"]) == 2
+
+
+def test_aware_bounds_become_naive_utc():
+    assert _naive_utc(datetime(2026, 10, 18, 3, tzinfo=timezone(timedelta(hours=3)))) == datetime(2026, 10, 18)
+    assert _naive_utc(datetime(2026, 10, 18)) == datetime(2026, 10, 18)